@@ -7,7 +7,8 @@ sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 import streamlit as st
 import pandas as pd
 import datetime
-from modules import ui, storage, data, charts, reporting, i18n, ai_engine, scoring, adapter, indicators, evidence, mappings, roi
+import functools
+from modules import ui, storage, data, charts, reporting, i18n, ai_engine, scoring, adapter, indicators, evidence, mappings, roi, responses
 
 # --- Configuration ---
 st.set_page_config(
@@ -24,15 +25,25 @@ if 'ui_style' not in st.session_state:
 ui.load_custom_css(st.session_state['ui_style'])
 
 # --- Session State ---
-if 'responses' not in st.session_state:
-    st.session_state['responses'] = {}
-if 'ai_results' not in st.session_state:
-    st.session_state['ai_results'] = {}
 if 'provider_keys' not in st.session_state:
     st.session_state['provider_keys'] = {}
 if 'provider_models' not in st.session_state:
     st.session_state['provider_models'] = {}
 
+# Shared, read-only control catalog for this session's language (one per process and language).
+# Resolved again on every rerun, so a hot-reloaded catalog applies from the next interaction.
+st.session_state['catalog'] = data.get_catalog(i18n.get_lang())
+catalog = st.session_state['catalog']
+# Typed session responses (int8 score arrays + AI side table) in st.session_state['responses'],
+# moved onto the current catalog if it was hot-reloaded
+response_store = responses.get_session_store(st.session_state, catalog)
+# Slider changes reach the session's scoring models as single-answer deltas
+response_store.listen('scoring_models', functools.partial(adapter.apply_score_change, st.session_state.setdefault('scoring_models', {})))
+
+# (scope, project_type) of each assessment tab; the sidebar and the risk monitor score the tab last opened
+ASSESSMENT_SCOPES = {"Enterprise": ("org", "none"), "Cloud": ("project", "cloud"), "SaaS": ("project", "saas")}
+active_scope, active_type = ASSESSMENT_SCOPES.get(st.session_state.get('assessment_tab_selection'), ("org", "none"))
+
 # --- Sidebar ---
 st.sidebar.markdown("""
 <div style="text-align: center; padding: 1.5rem 0 1rem 0; border-bottom: 1px solid #F1F5F9; margin-bottom: 1.5rem;">
@@ -200,7 +211,7 @@ with st.sidebar.expander("🤖 AI PRECISION ASSISTANT", expanded=True):
 
         # Generate Context for AI
         # Use v2 metrics if on Dashboard, otherwise general
-        v2_metrics = adapter.get_v2_metrics(st.session_state.get('responses', {}))
+        v2_metrics = adapter.get_scoring_model(st.session_state['scoring_models'], response_store, active_scope, active_type, catalog=catalog).metrics()
         overall = adapter.get_overall_metrics(v2_metrics)
         ctx = f"Maturity Level: {overall['maturity_level']} | Score: {overall['score']:.2f} | Gaps: {overall['critical_gaps']}"
         
@@ -410,7 +421,7 @@ if page == "Assessment":
         """, unsafe_allow_html=True)
         if st.button("✖️ Cancel Draft & Clear Data", key="cancel_cloning", help="Exit cloning mode and clear loaded responses"):
             del st.session_state['cloning_from']
-            if 'responses' in st.session_state: st.session_state['responses'] = {}
+            response_store.clear()
             # Also clear individual keys if needed, but 'responses' is the main one.
             # Actually, the widgets use unique_id keys. It's safer to just rerun and hope they clear if not in state.
             st.rerun()
@@ -484,7 +495,7 @@ if page == "Assessment":
         # Let's set local variables for the rendering and ignore global session state for 'display' unless inside the button callbacks.
         
         # Get Filtered Data
-        active_data = data.get_controls_for_scope(scope_key, type_key)
+        active_data = data.get_controls_for_scope(scope_key, type_key, catalog=catalog)
         
         # --- Silicon Precision Hero Section ---
         st.markdown(f"""
@@ -579,6 +590,9 @@ if page == "Assessment":
         else:
             selected_wave_id = next(k for k, v in waves.items() if v == selected_wave_label)
         
+        # Precompiled view for the selected wave (no per-rerun filtering)
+        wave_data = data.get_controls_for_scope(scope_key, type_key, wave=selected_wave_id, catalog=catalog)
+        
         # --- Project Name & Progress Indicator ---
         col_name, col_progress = st.columns([2, 1])
         
@@ -586,23 +600,10 @@ if page == "Assessment":
             project_name = st.text_input(i18n.t("project_name_label"), placeholder=i18n.t("project_name_placeholder"), key=f"proj_name_{scope_key}_{type_key}")
         
         with col_progress:
-            total_controls = 0
-            completed_controls = 0
-            
-            for func in active_data:
-                for subcat_key in active_data[func]:
-                    for control in active_data[func][subcat_key]['csa_controls']:
-                        if selected_wave_id is not None and control.get('wave', 2) != selected_wave_id:
-                            continue
-                        
-                        total_controls += 1
-                        unique_id = f"score_{scope_key}_{type_key}_{subcat_key}_{control['id']}"
-                        
-                        # Fix: Check the persistent 'responses' dict first
-                        score_num = st.session_state.get('responses', {}).get(unique_id, 0)
-                        
-                        if score_num > 0:
-                            completed_controls += 1
+            # Masked count over the catalog control table (reads the session's score array)
+            completed_controls, total_controls = data.get_progress(
+                response_store, scope_key, type_key, wave=selected_wave_id, catalog=catalog
+            )
             
             completion_pct = (completed_controls / total_controls * 100) if total_controls > 0 else 0
             
@@ -625,18 +626,19 @@ if page == "Assessment":
                         for control in active_data[func][subcat_key]['csa_controls']:
                             unique_id = f"score_{scope_key}_{type_key}_{subcat_key}_{control['id']}"
                             
-                            # Use persistent dict
-                            score = st.session_state.get('responses', {}).get(unique_id, 0)
+                            # Use persistent store
+                            score = response_store.get_score(scope_key, type_key, control['id'])
                             
-                            ai_data = st.session_state.get('ai_results', {}).get(unique_id, {})
+                            ai_data = response_store.get_ai(scope_key, type_key, control['id']) or {}
                             final_responses.append({
                                 "category": func,
                                 "question_id": control['id'],
                                 "score": score,
                                 "notes": f"{ai_data.get('justification', '')}\nSources: {', '.join(ai_data.get('sources', [])) if ai_data.get('sources') else ''}",
                                 "ai_justification": ai_data.get('justification', ''),
-                                "ai_sources": ", ".join(ai_data.get('sources', [])) if ai_data.get('sources') else '',
-                                "mapping": subcat_key
+                                "ai_sources": ai_data.get('sources') or [],
+                                "mapping": subcat_key,
+                                "domain": control.get('domain', '')
                             })
                 
                 # Calculate stats
@@ -646,8 +648,7 @@ if page == "Assessment":
                     func_count = 0
                     for subcat_key in active_data[func]:
                         for control in active_data[func][subcat_key]['csa_controls']:
-                            unique_id = f"score_{scope_key}_{type_key}_{subcat_key}_{control['id']}"
-                            score = st.session_state.get('responses', {}).get(unique_id, 0)
+                            score = response_store.get_score(scope_key, type_key, control['id'])
                             func_total += score
                             func_count += 1
                     
@@ -659,7 +660,8 @@ if page == "Assessment":
                 if avg_score > 3.0: level = "Managed"
                 if avg_score > 4.5: level = "Optimized"
                 
-                storage.save_assessment(project_name, final_responses, avg_score, level, scope=scope_key, project_type=type_key)
+                storage.save_assessment(project_name, final_responses, avg_score, level, scope=scope_key, project_type=type_key, store=response_store)
+                adapter.invalidate_metrics(st.session_state.get('scoring_models'))
                 if 'cloning_from' in st.session_state:
                     del st.session_state['cloning_from']
                 
@@ -695,12 +697,8 @@ if page == "Assessment":
              
              if active_key:
                 target_controls = []
-                for sk, sd in active_data[target_func].items():
-                    c_list = sd.get('csa_controls', [])
-                    if selected_wave_id is not None:
-                         target_controls.extend([(sk, c) for c in c_list if c.get('wave', 2) == selected_wave_id])
-                    else:
-                         target_controls.extend([(sk, c) for c in c_list])
+                for sk, sd in wave_data.get(target_func, {}).items():
+                    target_controls.extend([(sk, c) for c in sd.get('csa_controls', [])])
                 
                 if target_controls:
                     progress_bar = st.progress(0)
@@ -713,12 +711,11 @@ if page == "Assessment":
                         progress_bar.progress((idx + 1) / len(target_controls))
                         unique_id = f"score_{scope_key}_{type_key}_{sk}_{c['id']}"
                         try:
-                            res = engine.assess_control(c['text'], c.get('help', ''), active_key, provider=current_provider, model_name=active_model)
-                            st.session_state['ai_results'][unique_id] = res
+                            res = engine.assess_control(c['text'], catalog.get_help(c['id']), active_key, provider=current_provider, model_name=active_model)
+                            response_store.set_ai(scope_key, type_key, c['id'], res)
                             if 'score' in res and isinstance(res['score'], int):
-                                st.session_state['responses'][unique_id] = res['score']
-                                options = ["Not Implemented (0)", "Initial (1)", "Defined (2)", "Managed (3)", "Measured (4)", "Optimized (5)"]
-                                st.session_state[unique_id] = options[max(0, min(5, res['score']))]
+                                response_store.set_score(scope_key, type_key, c['id'], res['score'])
+                                st.session_state[unique_id] = responses.SCORE_OPTIONS[max(0, min(5, res['score']))]
                         except Exception as e:
                             print(f"Error: {e}")
                     
@@ -737,15 +734,11 @@ if page == "Assessment":
                 
                 st.divider()
                 
-                subcats = active_data[func]
+                subcats = wave_data.get(func, {})
                 has_visible_controls = False
                 
                 for subcat_key, subcat_data in subcats.items():
-                    csa_controls = subcat_data.get('csa_controls', [])
-                    if selected_wave_id is not None:
-                        visible_controls = [c for c in csa_controls if c.get('wave', 2) == selected_wave_id]
-                    else:
-                        visible_controls = csa_controls
+                    visible_controls = subcat_data.get('csa_controls', [])
                     
                     if not visible_controls: continue
                     has_visible_controls = True
@@ -754,10 +747,9 @@ if page == "Assessment":
                     current_subcat_total = 0
                     responded_count = 0
                     for c in visible_controls:
-                        unique_id = f"score_{scope_key}_{type_key}_{subcat_key}_{c['id']}"
-                        score = st.session_state.get('responses', {}).get(unique_id, 0)
-                        if score > 0: responded_count += 1
-                        current_subcat_total += score
+                        score = response_store.get_score(scope_key, type_key, c['id'], default=responses.UNANSWERED)
+                        if responses.answered(score): responded_count += 1
+                        current_subcat_total += max(score, 0)
                     subcat_avg = current_subcat_total / len(visible_controls) if visible_controls else 0
                     total_controls_in_subcat = len(visible_controls)
                     
@@ -768,7 +760,7 @@ if page == "Assessment":
                                 <span style="color: #64748B; font-size: 0.85rem; font-weight: 600; text-transform: uppercase; letter-spacing: 0.05em;">Subcategory Maturity</span>
                                 <span style="color: #2563EB; font-weight: 800; font-size: 1.1rem;">{subcat_avg:.1f} / 5.0</span>
                             </div>
-                            <p style="color: #475569; font-style: italic; font-size: 0.95rem; margin-bottom: 1.5rem;">{subcat_data['description']}</p>
+                            <p style="color: #475569; font-style: italic; font-size: 0.95rem; margin-bottom: 1.5rem;">{catalog.get_description(subcat_key)}</p>
                         """, unsafe_allow_html=True)
                         st.divider()
                         
@@ -803,20 +795,24 @@ if page == "Assessment":
                                     with st.spinner(f"Analyzing..."):
                                         engine = ai_engine.get_engine()
                                         active_model = st.session_state.get('provider_models', {}).get(current_provider)
-                                        res = engine.assess_control(control['text'], control.get('help', ''), active_key, provider=current_provider, model_name=active_model)
-                                        st.session_state['ai_results'][unique_id] = res
+                                        res = engine.assess_control(control['text'], catalog.get_help(control['id']), active_key, provider=current_provider, model_name=active_model)
+                                        response_store.set_ai(scope_key, type_key, control['id'], res)
                                         if 'score' in res and isinstance(res['score'], int):
-                                            st.session_state['responses'][unique_id] = res['score']
-                                            options = ["Not Implemented (0)", "Initial (1)", "Defined (2)", "Managed (3)", "Measured (4)", "Optimized (5)"]
-                                            st.session_state[unique_id] = options[max(0, min(5, res['score']))]
+                                            response_store.set_score(scope_key, type_key, control['id'], res['score'])
+                                            st.session_state[unique_id] = responses.SCORE_OPTIONS[max(0, min(5, res['score']))]
                                         st.rerun()
                                 else:
                                     st.error(i18n.t("key_required_error"))
 
+                            # One score per control: widgets of the same control under other
+                            # subcategories show the stored value; changes reach the store via on_change
+                            stored = response_store.get_score(scope_key, type_key, control['id'], default=None)
+                            if stored is not None and st.session_state.get(unique_id) != responses.SCORE_OPTIONS[stored]:
+                                st.session_state[unique_id] = responses.SCORE_OPTIONS[stored]
+
                             # Render Control
-                            ai_data = st.session_state['ai_results'].get(unique_id)
-                            score = ui.render_control_input(control, unique_id, ai_feedback=ai_data) # ui.render uses unique_id key in st.selectbox
-                            st.session_state['responses'][unique_id] = score
+                            ai_data = response_store.get_ai(scope_key, type_key, control['id'])
+                            ui.render_control_input(control, unique_id, ai_feedback=ai_data, help_text=catalog.get_help(control['id']), store=response_store) # ui.render uses unique_id key in st.selectbox
                 
                 if not has_visible_controls:
                     st.warning(f"No visible controls for current wave.")
@@ -861,42 +857,60 @@ elif page == "Executive Dashboard":
     # Auto-generated Executive Summary (placeholder, will be populated after metrics calculation)
     summary_placeholder = st.empty()
     
-    df = storage.load_history()
-    
     # Check if we have history, otherwise use Demo Data / Current Session
     # For MVP, let's allow "Current Session" visualization if no history
-    has_history = not df.empty
+    has_history = storage.has_history()
     
     if has_history:
-        # Selection Logic (Existing)
+        # Selection Logic: one keyset-paginated page of snapshots, filtered by name prefix and scope
         col_sel, col_date = st.columns([3, 1])
         with col_sel:
+            col_search, col_scope = st.columns([3, 1])
+            search = col_search.text_input("Search snapshots", placeholder="Project name starts with...", key="history_search").strip()
+            scope_filter = col_scope.selectbox("Scope", ["All", "org", "project"], key="history_scope")
+            filters = {'project': search or None, 'scope': None if scope_filter == "All" else scope_filter}
+
+            # Cursor stack for the pages already visited; reset when the filters change
+            if st.session_state.get('history_filters') != filters:
+                st.session_state['history_filters'] = filters
+                st.session_state['history_cursors'] = [None]
+            cursors = st.session_state['history_cursors']
+
+            df, has_older = storage.load_history_page(after=cursors[-1], **filters)
+            if df.empty:
+                st.warning("No snapshots match the search; showing the latest ones.")
+                df, has_older = storage.load_history_page()[0], False
+
             assessment_options = {}
-            for index, row in df.iterrows():
-                scope_label = row.get('scope', 'Org').upper() if row.get('scope') else 'ORG'
-                ptype_label = f"({row.get('project_type')})" if row.get('project_type') and row.get('project_type') != 'none' else ""
-                label = f"{row['project_name']} [{scope_label}{ptype_label}] ({row['timestamp']})"
-                assessment_options[label] = row['id']
+            for row in df.itertuples(index=False):
+                scope_label = row.scope.upper() if row.scope else 'ORG'
+                ptype_label = f"({row.project_type})" if row.project_type and row.project_type != 'none' else ""
+                label = f"{row.project_name} [{scope_label}{ptype_label}] ({row.timestamp})"
+                assessment_options[label] = row.id
             selected_option = st.selectbox("Select Assessment Snapshot:", list(assessment_options.keys()))
             selected_id = assessment_options[selected_option]
+
+            col_newer, col_page, col_older = st.columns([1, 2, 1])
+            if col_newer.button("‹ Newer", key="history_newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+            # Matches are only counted for an active search (the unfiltered history is not scanned)
+            if any(filters.values()):
+                col_page.caption(f"Page {len(cursors)} · {storage.count_history(**filters)} match(es)")
+            else:
+                col_page.caption(f"Page {len(cursors)}")
+            if col_older.button("Older ›", key="history_older", disabled=not has_older):
+                cursors.append(storage.history_cursor(df))
+                st.rerun()
         
-        # Get data
-        details_df = storage.get_assessment_details(selected_id)
-        if not details_df.empty:
-            # Reconstruct Category Scores
-            category_scores = details_df.groupby('category')['score'].mean().to_dict()
-            
-            # --- Enrich Domain Information ---
-            # Create a lookup for ID -> Domain efficiently
-            id_to_domain = {}
-            for func, subcats in data.ASSESSMENT_DATA.items():
-                for subcat_key, content in subcats.items():
-                    controls = content.get('csa_controls', [])
-                    for c in controls:
-                        id_to_domain[c['id']] = c.get('domain', 'Unmapped')
-            
-            details_df['domain'] = details_df['question_id'].map(id_to_domain).fillna('Unmapped')
-            domain_scores = details_df.groupby('domain')['score'].mean().to_dict()
+        # Get data: aggregates materialized at save time (response rows are only read on demand)
+        rollups = storage.get_rollups(selected_id, domain_of=lambda q_id: catalog.index.get(q_id, {}).get('domain'))
+        details_df = pd.DataFrame()
+        snapshot_answers = None
+        if rollups:
+            # Category (NIST function) and CSA domain means
+            category_scores = {k: v['mean_score'] for k, v in rollups['category'].items()}
+            domain_scores = {k: v['mean_score'] for k, v in rollups['domain'].items()}
             
             # Calculate Total Score
             sel_row = df[df['id'] == selected_id].iloc[0]
@@ -917,28 +931,14 @@ elif page == "Executive Dashboard":
                         st.session_state['scope_mode'] = 'Project'
                         st.session_state['project_type_sel'] = 'Cloud' if 'cloud' in pt.lower() else 'SaaS'
                     
-                    # Populate Responses
-                    new_responses = {}
-                    for _, r in details_df.iterrows():
-                        # Reconstruct Key: score_{scope}_{type}_{subcat}_{id}
-                        subcat = mappings.get_subcat_from_id(r['question_id'])
-                        if subcat != "Unmapped":
-                             key = f"score_{sc}_{pt}_{subcat}_{r['question_id']}"
-                             new_responses[key] = r['score']
-                             
-                             # Fix: Widget expects string from options list
-                             options = ["Not Implemented (0)", "Initial (1)", "Defined (2)", "Managed (3)", "Measured (4)", "Optimized (5)"]
-                             try:
-                                 score_idx = max(0, min(5, int(r['score'])))
-                                 st.session_state[key] = options[score_idx]
-                             except:
-                                 st.session_state[key] = options[0]
-                             
-                             # Restore AI/Notes if possible?
-                             # Notes are in r['notes'], but AI widgets use separate keys.
-                             # For MVP, restoring Scores is the critical part.
+                    # Populate Responses from the snapshot's score vectors (widgets pick the
+                    # stored scores up when the assessment view renders)
+                    snapshot_store = storage.get_snapshot_store(selected_id, catalog, sc, pt)
+                    response_store.clear()
+                    if snapshot_store is not None:
+                        response_store.merge(snapshot_store)
                     
-                    st.session_state['responses'] = new_responses
+                    adapter.invalidate_metrics(st.session_state.get('scoring_models'))
                     target_tab = "Enterprise" if sc.lower() == 'org' else pt.title()
                     # Force the correct sub-tab to open
                     st.session_state['assessment_tab_selection'] = target_tab
@@ -947,13 +947,19 @@ elif page == "Executive Dashboard":
                     # Safe Navigation Switch
                     st.session_state['nav_override'] = "Assessment"
                     st.rerun()
+            # The snapshot's maturity scores as answers_map entries, for the Quick Win ranking;
+            # read from the score vectors saved with the rollups, not from the response rows
+            snapshot_scope = sel_row.get('scope') or 'org'
+            snapshot_type = sel_row.get('project_type') or 'none'
+            snapshot_store = storage.get_snapshot_store(selected_id, catalog, snapshot_scope, snapshot_type)
+            snapshot_answers = snapshot_store.answers_map(snapshot_scope, snapshot_type) if snapshot_store is not None else None
             total_avg_score = sel_row['total_score']
             maturity_level = sel_row['maturity_level']
-            # Mock Gaps count (Controls < 3)
-            critical_gaps = details_df[details_df['score'] < 3].shape[0]
-            compliance_pct = (details_df[details_df['score'] >= 3].shape[0] / details_df.shape[0]) * 100 if details_df.shape[0] > 0 else 0
+            # Gaps are controls scored below storage.IMPLEMENTED_SCORE (3)
+            critical_gaps = rollups['total']['gap_count']
+            compliance_pct = rollups['total']['compliance_pct']
             open_risks = critical_gaps  # Same as critical_gaps
-            controls_implemented = details_df[details_df['score'] >= 3].shape[0]
+            controls_implemented = rollups['total']['implemented_count']
             
     else:
         # DEMO / EMPTY STATE
@@ -967,6 +973,7 @@ elif page == "Executive Dashboard":
         open_risks = 12  # Demo: count of controls < 3
         controls_implemented = 92  # Demo: count of controls >= 3
         details_df = pd.DataFrame() # Initialize empty for safety
+        snapshot_answers = None
         
     # === ROI CONFIGURATION ===
     with st.expander("⚙️ ROI Assumptions (Click to Configure Financial Model)"):
@@ -976,6 +983,18 @@ elif page == "Executive Dashboard":
         with c_prob:
             prob_rate = st.slider("Baseline Incident Probability (Annual)", 0.0, 1.0, 0.35, help="Probability of a significant AI incident without controls (Level 1)")
 
+        # Monte Carlo loss distribution per NIST function (cached by inputs in roi.simulate_losses)
+        n_samples = st.select_slider("Simulated Years (Monte Carlo)", options=[10000, 100000, 1000000], value=roi.DEFAULT_SAMPLES)
+        loss_sim = roi.simulate_losses(category_scores, baseline_breach_cost=breach_cost, prob_low_maturity=prob_rate, n_samples=n_samples)
+        if loss_sim:
+            m_p50, m_p90, m_p99, m_var = st.columns(4)
+            m_p50.metric("Annual Loss P50", f"${loss_sim['p50']/1000000:.2f}M")
+            m_p90.metric("Annual Loss P90", f"${loss_sim['p90']/1000000:.2f}M")
+            m_p99.metric("Annual Loss P99", f"${loss_sim['p99']/1000000:.2f}M")
+            m_var.metric(f"VaR {loss_sim['var_level']:.0%}", f"${loss_sim['var']/1000000:.2f}M")
+            st.caption(f"Expected loss ${loss_sim['expected_loss']/1000000:.2f}M vs. ${loss_sim['baseline_expected_loss']/1000000:.2f}M baseline "
+                       f"(expected savings ${loss_sim['expected_savings']/1000000:.2f}M, {loss_sim['n_samples']:,} simulated years).")
+
     # Calculate ROI based on score
     roi_results = roi.calculate_roi(total_avg_score, baseline_breach_cost=breach_cost, prob_low_maturity=prob_rate)
     
@@ -999,12 +1018,19 @@ elif page == "Executive Dashboard":
     else:
         strongest_func, weakest_func, strength_val, weak_val = "N/A", "N/A", 0, 0
 
-    # Quick Win: Find a control in the weakest domain with score < 2
+    # Quick Win: the control of the selected snapshot whose improvement raises the overall
+    # score most, preferring the weakest domain (see adapter.get_sensitivity)
     quick_win = "N/A"
-    if not details_df.empty:
-        low_controls = details_df[(details_df['category'] == weakest_func) & (details_df['score'] < 3)]
-        if not low_controls.empty:
-            quick_win = low_controls.iloc[0]['question_id']
+    gains = adapter.get_sensitivity(
+        snapshot_answers,
+        snapshot_scope,
+        snapshot_type,
+        selected_frameworks=st.session_state.get('selected_frameworks') or None,
+        catalog=catalog
+    ) if snapshot_answers else []
+    if gains:
+        best_gain = next((g for g in gains if g['nist_function'] == weakest_func), gains[0])
+        quick_win = f"{best_gain['question_id']} (+{best_gain['delta']:.2f})"
     
     # === ROW 1: HEADLINE METRICS (SYMMETRIC 4-COLUMN) ===
     kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
@@ -1114,11 +1140,16 @@ elif page == "Executive Dashboard":
                 st.rerun()
 
     # Calculate v2 Metrics using the Adapter
-    # We use the persistent responses from st.session_state
-    v2_metrics = adapter.get_v2_metrics(
-        st.session_state.get('responses', {}),
-        selected_frameworks=st.session_state.selected_frameworks if st.session_state.selected_frameworks else None
-    )
+    # The session's scoring model is built from the response store once and then
+    # updated by the slider callbacks, so a rerun re-scores nothing
+    v2_metrics = adapter.get_scoring_model(
+        st.session_state['scoring_models'],
+        response_store,
+        active_scope,
+        active_type,
+        selected_frameworks=st.session_state.selected_frameworks if st.session_state.selected_frameworks else None,
+        catalog=catalog
+    ).metrics()
     overall = adapter.get_overall_metrics(v2_metrics)
     
     persona_tabs = st.tabs(["🏛️ Executive", "⚖️ GRC & Compliance", "🛠️ Specialist & Technical"])
@@ -1129,13 +1160,13 @@ elif page == "Executive Dashboard":
         
         with col_main:
             st.markdown("### 🎯 AI Security & Risk Indicators")
-            # Calculate Indicators
-            all_questions = []
-            for dm in v2_metrics:
-                for sm in dm.subcategory_metrics:
-                    all_questions.extend(sm.questions)
-            
-            ai_indicators = indicators.calculate_indicators(all_questions, st.session_state.get('responses', {}))
+            # Calculate Indicators: the active assessment's score vector over the selected rows
+            selected_rows = catalog.select_rows(active_scope, active_type, frameworks=st.session_state.selected_frameworks or None)
+            ai_indicators = indicators.calculate_indicators(
+                response_store.scores(active_scope, active_type),
+                catalog=catalog,
+                control_idx=catalog.table['control_idx'].to_numpy()[selected_rows]
+            )
             
             # Render Indicator Cards
             ind_col1, ind_col2 = st.columns(2)
@@ -1217,12 +1248,13 @@ elif page == "Executive Dashboard":
     
     roadmap_items = scoring.generate_roadmap(v2_metrics)
     
-    road_col1, road_col2, road_col3 = st.columns(3)
+    road_col1, road_col2, road_col3, road_col4 = st.columns(4)
     
     road_sections = [
         {'id': 'immediate', 'col': road_col1, 'title': '0-30 Dias (Crítico)', 'color': '#EF4444', 'bg': '#FEF2F2'},
         {'id': 'short', 'col': road_col2, 'title': '30-60 Dias (Prioritário)', 'color': '#F59E0B', 'bg': '#FFFBEB'},
-        {'id': 'medium', 'col': road_col3, 'title': '60-90 Dias (Estratégico)', 'color': '#3B82F6', 'bg': '#EFF6FF'}
+        {'id': 'medium', 'col': road_col3, 'title': '60-90 Dias (Estratégico)', 'color': '#3B82F6', 'bg': '#EFF6FF'},
+        {'id': 'long', 'col': road_col4, 'title': '90+ Dias (Estruturante)', 'color': '#6366F1', 'bg': '#EEF2FF'}
     ]
     
     for section in road_sections:
@@ -1291,47 +1323,49 @@ elif page == "Executive Dashboard":
                 'scope': st.session_state.get('scope_mode', 'Organization')
             }
             
-            # Generate HTML
-            # Lazy load: only generate when needed? No, Streamlit needs data for btn.
-            # Efficient enough for local execution.
-            if 'details_df' not in locals(): details_df = pd.DataFrame() # Handle empty
-            html_report = reporting.generate_html_report(metrics, charts_dict, details_df, meta)
-            
-            st.download_button(
-                label="📥 Download PDF Report (Printable)",
-                data=html_report,
-                file_name=f"executive_report_{meta['date']}.html",
-                mime="text/html",
-                help="Generates an enterprise-ready report including Maturity Gauge, Benchmarks, and NIST/CSA Mapping."
-            )
+            # Generate HTML only on request: the report needs the snapshot's response rows
+            report_key = selected_id if 'selected_id' in locals() else None
+            if st.button("📄 Prepare Report", key="prepare_report"):
+                st.session_state['report_for'] = report_key
+            if st.session_state.get('report_for', False) == report_key:
+                report_df = storage.get_assessment_details(report_key) if report_key is not None else pd.DataFrame()
+                html_report = reporting.generate_html_report(metrics, charts_dict, report_df, meta)
+                
+                st.download_button(
+                    label="📥 Download PDF Report (Printable)",
+                    data=html_report,
+                    file_name=f"executive_report_{meta['date']}.html",
+                    mime="text/html",
+                    help="Generates an enterprise-ready report including Maturity Gauge, Benchmarks, and NIST/CSA Mapping."
+                )
             st.markdown('<p style="color: #64748B; font-size: 0.8rem; margin-top: -10px;">Contains detailed control mapping to NIST AI RMF & CSA AICM</p>', unsafe_allow_html=True)
         with col_rep_info:
              st.info("💡 **Pro Tip:** For a vector-quality Board Report, open the downloaded file and use **Print to PDF**.")
 
     # === ROW 4: DETAILED AUDIT & COMPLIANCE LOG ===
-    if 'details_df' in locals() and not details_df.empty:
+    # Response rows are loaded only while the matrix is switched on
+    if has_history and 'selected_id' in locals():
         st.markdown("---")
-        with st.expander("🔍 View Detailed Assessment & Compliance Matrix", expanded=False):
+        if st.toggle("🔍 View Detailed Assessment & Compliance Matrix", key="show_detail_matrix"):
+            details_df = storage.get_assessment_details(selected_id)
             st.info(f"Showing detailed records for: **{selected_option if 'selected_option' in locals() else 'Detailed View'}**")
             
             # Prepare DataFrame for Display
             display_df = details_df.copy()
             
             # --- COMPLIANCE MAPPING ---
-            # 1. Get NIST Subcategory (e.g. GOVERN 1.1)
-            display_df['nist_subcat'] = display_df['question_id'].apply(mappings.get_subcat_from_id)
+            # 1. Get NIST Subcategory (e.g. GOVERN 1.1) and Requirement Text in one merge
+            display_df = mappings.enrich_controls(display_df, columns=['nist_subcat', 'text'], catalog=catalog)
+            display_df['nist_subcat'] = display_df['nist_subcat'].fillna('Unmapped')
+            display_df['Requirement'] = display_df['text'].fillna('Control text not found')
             
-            # 2. Get Requirement Text
-            display_df['Requirement'] = display_df['question_id'].apply(lambda x: mappings.get_control_info(x)['text'])
-            
-            # 3. Get Framework Mappings
-            def get_map(subcat, framework):
-                m = mappings.get_compliance_mapping(subcat)
-                return m.get(framework, '-')
-                
-            display_df['NIST GenAI (600-1)'] = display_df['nist_subcat'].apply(lambda x: get_map(x, 'nist_600_1'))
-            display_df['ISO 27001'] = display_df['nist_subcat'].apply(lambda x: get_map(x, 'iso_27001'))
-            display_df['EU AI Act'] = display_df['nist_subcat'].apply(lambda x: get_map(x, 'eu_ai_act'))
+            # 2. Get Framework Mappings (resolved once per distinct subcategory)
+            display_df = mappings.enrich_compliance(display_df, 'nist_subcat')
+            display_df = display_df.rename(columns={
+                'nist_600_1': 'NIST GenAI (600-1)',
+                'iso_27001': 'ISO 27001',
+                'eu_ai_act': 'EU AI Act'
+            })
             
             # Safely filter columns
             cols_to_show = ['category', 'question_id', 'Requirement', 'score', 'notes', 'NIST GenAI (600-1)', 'ISO 27001', 'EU AI Act']
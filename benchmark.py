@@ -0,0 +1,234 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import platform
+
+# Ensure we can import from modules
+sys.path.append(os.getcwd())
+
+import numpy as np
+from modules import data, adapter, scoring, indicators, roi
+from modules import catalog as catalog_layer
+
+# Benchmark Suite
+# Times scope filtering, v2 metrics, incremental scoring, sensitivity, indicators,
+# roadmap and ROI on synthetic catalogs, and compares the run against a JSON baseline.
+# Each size also checks the vectorized kernel against adapter.get_v2_metrics_reference.
+#
+#   python benchmark.py                      # compare with benchmark_baseline.json
+#   python benchmark.py --update-baseline    # record this machine's baseline
+#   python benchmark.py --sizes 10000 --fanout 3
+
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_SIZES = (10000, 100000)
+DEFAULT_THRESHOLD = 0.25   # Fail when a case is this much slower than its baseline...
+MIN_REGRESSION = 0.002     # ...and at least this many seconds slower (timer noise)
+
+NIST_FUNCTIONS = ("GOVERN", "MAP", "MEASURE", "MANAGE")
+FRAMEWORKS = ("CSA AI Security", "NIST AI RMF", "Synthetic Framework")
+WORDS = ("model", "training data", "adversarial", "bias", "access", "logging", "policy", "supplier",
+         "inference", "privacy", "incident", "html", "encryption", "prompt injection", "review")
+RESPONSES = ('Sim', 'Parcial', 'Não', 'NA')
+DELTA_ANSWERS = ({'response': 'Sim', 'evidence_ok': 'Sim'}, {'response': 'Não', 'evidence_ok': 'Não'})
+TOLERANCE = 1e-9
+
+# --- Synthetic Data ---
+
+def make_catalog_tree(n_controls, fanout=2, subcat_size=20, seed=0):
+    """
+    {func: {subcat: {description, csa_controls}}} with n_controls controls over the real
+    CSA domains; each control is listed in `fanout` subcategories of its function.
+    """
+    rng = random.Random(seed)
+    domains = list(data.DOMAIN_SCOPES)
+    n_subcats = max(1, n_controls * fanout // subcat_size)
+    subcats = [(NIST_FUNCTIONS[i * len(NIST_FUNCTIONS) // n_subcats], f"SYN-{i:05d}") for i in range(n_subcats)]
+    by_func = {}
+    for func, key in subcats:
+        by_func.setdefault(func, []).append(key)
+
+    tree = {func: {key: {'description': f"Synthetic subcategory {key}", 'csa_controls': []} for key in keys}
+            for func, keys in by_func.items()}
+    for i in range(n_controls):
+        func = NIST_FUNCTIONS[i % len(NIST_FUNCTIONS)]
+        control = {
+            'id': f"SYN-{i:06d}",
+            'text': " ".join(rng.choice(WORDS) for _ in range(6)),
+            'help': " ".join(rng.choice(WORDS) for _ in range(12)),
+            'domain': rng.choice(domains),
+            'wave': rng.randint(1, 3),
+            'frameworks': rng.sample(FRAMEWORKS, rng.randint(1, len(FRAMEWORKS)))
+        }
+        for key in rng.sample(by_func[func], min(fanout, len(by_func[func]))):
+            tree[func][key]['csa_controls'].append(control)
+
+    # Catalog order keeps every function's subcategories contiguous
+    return {func: dict(sorted(subs.items())) for func, subs in tree.items()}
+
+def make_responses(control_ids, answered=0.5, seed=0):
+    """answers_map with a random `answered` share of the controls."""
+    rng = random.Random(seed)
+    return {
+        c_id: {'response': rng.choice(RESPONSES), 'evidence_ok': rng.choice(RESPONSES)}
+        for c_id in control_ids if rng.random() < answered
+    }
+
+# --- Kernel Check ---
+
+def metrics_mismatches(metrics, reference):
+    """Fields where kernel DomainMetrics differ from the reference implementation's."""
+    def rows(ms):
+        out = []
+        for dm in ms:
+            out.append((dm.domain_id, dm.score, dm.coverage, dm.total_questions, dm.answered_questions,
+                        dm.applicable_questions, dm.critical_gaps))
+            out.extend((dm.domain_id, sm.subcat_id, sm.score, sm.coverage, sm.total_questions, sm.answered_questions,
+                        sm.applicable_questions, sm.critical_gaps, sm.criticality) for sm in dm.subcategory_metrics)
+        return out
+
+    got, want = rows(metrics), rows(reference)
+    if len(got) != len(want):
+        return [f"{len(got)} rows vs {len(want)} in the reference"]
+    return [f"{a} != {b}" for a, b in zip(got, want)
+            if len(a) != len(b) or any(x != y and not (isinstance(x, float) and abs(x - y) <= TOLERANCE)
+                                       for x, y in zip(a, b))]
+
+def check_kernel(cat, answers):
+    """Kernel vs get_v2_metrics_reference on the benchmark inputs, for a few scopes and a framework filter."""
+    ok = True
+    for scope, project_type, frameworks in (("org", "none", None), ("project", "cloud", None), ("project", "saas", ["NIST AI RMF"])):
+        mismatches = metrics_mismatches(adapter._compute_v2_metrics(answers, scope, project_type, frameworks, cat),
+                                        adapter.get_v2_metrics_reference(answers, scope, project_type, frameworks, catalog=cat))
+        if mismatches:
+            ok = False
+            print(f"[FAIL] Kernel differs from the reference for {scope}/{project_type}: {mismatches[0]} ({len(mismatches)} rows)")
+    if ok:
+        print("[OK] Kernel matches get_v2_metrics_reference")
+    return ok
+
+# --- Timing ---
+
+def best_of(fn, repeat):
+    """Fastest of `repeat` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_size(n_controls, fanout, repeat, seed):
+    print(f"\n--- {n_controls} controls (fan-out {fanout}) ---")
+    timings = {}
+
+    start = time.perf_counter()
+    cat = catalog_layer.Catalog("bench", make_catalog_tree(n_controls, fanout, seed=seed), data.DOMAIN_SCOPES,
+                                version=f"bench-{n_controls}-{fanout}-{seed}")
+    timings['catalog_build'] = time.perf_counter() - start
+
+    answers = make_responses(cat.control_ids, seed=seed)
+    # Maturity score vector (ResponseStore.scores form) and the org selection's rows
+    scores = np.random.default_rng(seed).integers(-1, 6, len(cat.control_ids)).astype(np.int8)
+    org_control_idx = adapter.build_selection(cat, "org", "cloud")['control_idx']
+    metrics = adapter._compute_v2_metrics(answers, "org", "cloud", None, cat)
+    function_scores = {dm.domain_id: dm.score * 5 for dm in metrics}
+
+    def scope_filter():
+        for scope, project_type in (("org", "none"), ("project", "cloud"), ("project", "saas")):
+            cat.select_rows(scope, project_type, frameworks=["NIST AI RMF"])
+
+    def v2_metrics():
+        adapter.invalidate_metrics()
+        adapter.get_v2_metrics(answers, "org", "cloud", None, catalog=cat)
+
+    # The model is built and synced once; each run flips the same 1k controls to the other answer
+    model = scoring.ScoringModel(control_pos=cat.control_pos, **adapter.build_selection(cat, "org", "cloud"))
+    model.sync(answers)
+    delta_ids = cat.control_ids[:1000]
+    flips = iter(range(1 << 30))
+
+    def model_deltas():
+        answer = DELTA_ANSWERS[next(flips) % 2]
+        for c_id in delta_ids:
+            model.set_answer(c_id, answer)
+        model.metrics()
+
+    def sensitivity():
+        adapter.invalidate_metrics()
+        adapter.get_sensitivity(answers, "org", "cloud", None, catalog=cat)
+
+    def indicator_index():
+        indicators.reload_indicators_config()
+        indicators.get_indicator_index(cat)
+
+    cases = [
+        ('scope_filter', scope_filter),
+        ('v2_metrics', v2_metrics),
+        ('scoring_model_1k_deltas', model_deltas),
+        ('sensitivity', sensitivity),
+        ('indicator_index', indicator_index),
+        ('indicators', lambda: indicators.calculate_indicators(scores, catalog=cat, control_idx=org_control_idx)),
+        ('roadmap', lambda: scoring.generate_roadmap(metrics)),
+        ('roi_monte_carlo_1m', lambda: (roi._simulate.cache_clear(), roi.simulate_losses(function_scores, n_samples=1000000)))
+    ]
+    for name, fn in cases:
+        timings[name] = best_of(fn, repeat)
+
+    for name, seconds in timings.items():
+        print(f"{name:<26} {seconds * 1000:10.2f} ms")
+    return timings, check_kernel(cat, answers)
+
+# --- Baseline ---
+
+def compare(results, baseline, threshold):
+    """Cases slower than baseline by more than threshold (and MIN_REGRESSION seconds)."""
+    regressions = []
+    for size, cases in results.items():
+        for name, seconds in cases.items():
+            base = baseline.get(size, {}).get(name)
+            if base is not None and seconds > base * (1 + threshold) and seconds - base > MIN_REGRESSION:
+                regressions.append(f"{size}/{name}: {base * 1000:.2f} ms -> {seconds * 1000:.2f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring and catalog benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Catalog sizes (controls)")
+    parser.add_argument("--fanout", type=int, default=2, help="Subcategories listing each control")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the baseline")
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    results, kernel_ok = {}, True
+    for n in args.sizes:
+        results[f"{n}x{args.fanout}"], ok = run_size(n, args.fanout, args.repeat, args.seed)
+        kernel_ok = kernel_ok and ok
+    if not kernel_ok:
+        print("\n[FAIL] The scoring kernel does not match the reference implementation")
+        return 1
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(), 'results': results}, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f).get('results', {})
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print("\n[FAIL] Regressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\n[OK] No case slower than baseline by more than {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
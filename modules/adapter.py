@@ -1,73 +1,238 @@
 from typing import Dict, List, Any
-from modules import data, scoring
+from collections import OrderedDict
+import hashlib
+import threading
+import numpy as np
+from modules import data, scoring, responses
+from modules import catalog as catalog_layer
 
-def get_v2_metrics(answers_map: Dict[str, Dict[str, Any]], scope="org", project_type="cloud", selected_frameworks=None) -> List[scoring.DomainMetrics]:
+# NIST functions act as our Top-Level Domains
+NIST_NAMES = {
+    "GOVERN": "Policies & Governance (GOVERN)",
+    "MAP": "Contextualization & Mapping (MAP)",
+    "MEASURE": "Measurement & Evaluation (MEASURE)",
+    "MANAGE": "Incident Management & Mitigation (MANAGE)",
+    "CSA_EXTRA": "Cloud & Infrastructure Security (CSA)"
+}
+
+# get_v2_metrics / get_sensitivity memo, shared by every session in the process
+METRICS_CACHE_SIZE = 128
+_METRICS_CACHE = OrderedDict()
+_METRICS_STATS = {'hits': 0, 'misses': 0}
+_METRICS_LOCK = threading.Lock()
+
+def _criticality(wave_avg):
+    return "High" if wave_avg <= 1.5 else ("Medium" if wave_avg <= 2.5 else "Low")
+
+def _select_runs(catalog, scope, project_type, selected_frameworks):
+    # Scope + framework filters are one boolean mask over the control table;
+    # the selected rows split into one contiguous run per subcategory
+    rows = catalog.select_rows(scope=scope, project_type=project_type, frameworks=selected_frameworks)
+    return catalog_layer.split_subcat_runs(catalog.table, rows)
+
+def build_selection(catalog, scope="org", project_type="cloud", selected_frameworks=None) -> Dict[str, Any]:
     """
-    Adapts the filtered ASSESSMENT_DATA from modules.data into the v2 DomainMetrics structure.
-    Supports filtering by selected_frameworks.
+    Segment arrays for the scoring kernel: the selected control rows grouped into
+    subcategories (seg_starts) and NIST functions (domain_starts), plus each
+    subcategory's criticality from its average wave.
     """
-    filtered_data = data.get_controls_for_scope(scope=scope, project_type=project_type)
-    
-    domain_metrics_list = []
-    
-    # NIST functions act as our Top-Level Domains
-    nist_names = {
-        "GOVERN": "Policies & Governance (GOVERN)",
-        "MAP": "Contextualization & Mapping (MAP)",
-        "MEASURE": "Measurement & Evaluation (MEASURE)",
-        "MANAGE": "Incident Management & Mitigation (MANAGE)",
-        "CSA_EXTRA": "Cloud & Infrastructure Security (CSA)"
+    table = catalog.table
+    runs = _select_runs(catalog, scope, project_type, selected_frameworks)
+    rows = np.concatenate(runs) if runs else np.zeros(0, np.int64)
+    seg_starts = scoring.segment_starts(np.array([len(run) for run in runs]))
+    first_rows = rows[seg_starts]
+    funcs = table['func'].to_numpy()[first_rows]
+
+    wave_avg = np.add.reduceat(table['wave'].to_numpy()[rows].astype(np.float64), seg_starts) / np.diff(np.append(seg_starts, len(rows))) if runs else []
+    # Subcategories of one NIST function are contiguous in catalog order
+    domain_starts = np.flatnonzero(np.r_[True, funcs[1:] != funcs[:-1]]) if runs else np.zeros(0, np.int64)
+
+    return {
+        'domains': [(f, NIST_NAMES.get(f, f), f) for f in funcs[domain_starts]],
+        'domain_starts': domain_starts,
+        'subcat_ids': table['subcat'].to_numpy()[first_rows].tolist(),
+        'seg_starts': seg_starts,
+        'control_idx': table['control_idx'].to_numpy()[rows],
+        'criticality': [_criticality(w) for w in np.asarray(wave_avg).tolist()],
+        'weights': np.ones(len(runs))
     }
 
-    for nist_func, subcats in filtered_data.items():
-        domain_id = nist_func
-        domain_name = nist_names.get(nist_func, nist_func)
-        
+def responses_fingerprint(answers_map: Dict[str, Any]) -> str:
+    """Order-independent digest of a responses mapping (the scored fields only)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for q_id in sorted(answers_map, key=str):
+        answer = answers_map[q_id]
+        if isinstance(answer, dict):
+            answer = (answer.get('response'), answer.get('evidence_ok'))
+        digest.update(repr((q_id, answer)).encode("utf-8"))
+    return digest.hexdigest()
+
+def _compute_v2_metrics(answers_map, scope, project_type, selected_frameworks, catalog):
+    selection = build_selection(catalog, scope, project_type, selected_frameworks)
+    response, evidence = scoring.encode_answers(answers_map, catalog.control_pos, len(catalog.control_ids))
+    return scoring.calculate_domain_metrics_batch(response=response, evidence=evidence, **selection)
+
+def get_v2_metrics(answers_map: Dict[str, Dict[str, Any]], scope="org", project_type="cloud", selected_frameworks=None, catalog=None) -> List[scoring.DomainMetrics]:
+    """
+    Adapts the filtered catalog view from modules.data into the v2 DomainMetrics structure.
+    Supports filtering by selected_frameworks. Uses the session language catalog unless one is given.
+    Scores with the vectorized kernel (scoring.calculate_domain_metrics_batch); results are
+    memoized per (catalog version, language, scope, project type, frameworks, responses digest).
+    The returned list is shared between callers and must not be mutated.
+    """
+    catalog = catalog or data.get_catalog()
+    key = ('metrics', catalog.version, catalog.lang, scope, project_type,
+           frozenset(selected_frameworks or ()), responses_fingerprint(answers_map))
+    return _memoized(key, lambda: _compute_v2_metrics(answers_map, scope, project_type, selected_frameworks, catalog))
+
+def _memoized(key, compute):
+    """LRU lookup in _METRICS_CACHE; compute() runs outside the lock on a miss."""
+    with _METRICS_LOCK:
+        value = _METRICS_CACHE.get(key)
+        if value is not None:
+            _METRICS_CACHE.move_to_end(key)
+            _METRICS_STATS['hits'] += 1
+            return value
+        _METRICS_STATS['misses'] += 1
+
+    value = compute()
+    with _METRICS_LOCK:
+        _METRICS_CACHE[key] = value
+        while len(_METRICS_CACHE) > METRICS_CACHE_SIZE:
+            _METRICS_CACHE.popitem(last=False)
+    return value
+
+def invalidate_metrics(models=None):
+    """
+    Drops memoized get_v2_metrics / get_sensitivity results, plus the session's scoring models when given.
+    Called after an assessment is saved or a snapshot is cloned into the session.
+    """
+    with _METRICS_LOCK:
+        _METRICS_CACHE.clear()
+    if models is not None:
+        models.clear()
+
+def get_metrics_cache_info() -> Dict[str, int]:
+    with _METRICS_LOCK:
+        return dict(_METRICS_STATS, size=len(_METRICS_CACHE), maxsize=METRICS_CACHE_SIZE)
+
+def get_scoring_model(models: Dict, store, scope="org", project_type="none", selected_frameworks=None, catalog=None) -> scoring.ScoringModel:
+    """
+    Session-held incremental ScoringModel for a selection of the ResponseStore's (scope, project_type) answers.
+    models is a dict owned by the session (st.session_state['scoring_models']). A model is synced with the
+    store once, when built; after that it only receives the changes apply_score_change forwards from the
+    store. Models built for another catalog version are dropped, so a hot-reloaded catalog starts fresh.
+    """
+    catalog = catalog or data.get_catalog()
+    key = (catalog.lang, catalog.version, scope, project_type, frozenset(selected_frameworks or ()))
+    model = models.get(key)
+    if model is None:
+        for stale in [k for k in models if k[:2] != key[:2]]:
+            del models[stale]
+        model = scoring.ScoringModel(control_pos=catalog.control_pos,
+                                     **build_selection(catalog, scope, project_type, selected_frameworks))
+        model.sync(store.answers_map(scope, project_type))
+        models[key] = model
+    return model
+
+def apply_score_change(models: Dict, scope, project_type, control_id, score):
+    """
+    ResponseStore listener: one changed maturity score becomes an answers_map delta for every
+    session model of that (scope, project_type). A cleared store (all None) drops the models.
+    """
+    if control_id is None:
+        models.clear()
+        return
+    answer = responses.score_answer(score)
+    for key, model in models.items():
+        if key[2:4] == (scope, project_type):
+            model.set_answer(control_id, answer)
+
+def get_sensitivity(answers_map: Dict[str, Dict[str, Any]], scope="org", project_type="cloud", selected_frameworks=None, catalog=None, targets=scoring.SENSITIVITY_TARGETS, top_k=None) -> List[Dict[str, Any]]:
+    """
+    Which single control moves the overall score most: for every unanswered or
+    below-target control, the get_overall_metrics score delta of raising it to each
+    target (response, evidence_ok). Sorted by best delta; top_k limits the result.
+    Memoized like get_v2_metrics; the returned list is shared and must not be mutated.
+    """
+    catalog = catalog or data.get_catalog()
+    key = ('sensitivity', catalog.version, catalog.lang, scope, project_type, frozenset(selected_frameworks or ()),
+           tuple(targets), top_k, responses_fingerprint(answers_map))
+    return _memoized(key, lambda: _compute_sensitivity(answers_map, scope, project_type, selected_frameworks, catalog, targets, top_k))
+
+def _compute_sensitivity(answers_map, scope, project_type, selected_frameworks, catalog, targets, top_k):
+    selection = build_selection(catalog, scope, project_type, selected_frameworks)
+    response, evidence = scoring.encode_answers(answers_map, catalog.control_pos, len(catalog.control_ids))
+    target_scores = [scoring.encode_answer({'response': r, 'evidence_ok': ev}) for r, ev in targets]
+    positions, deltas = scoring.score_sensitivity(
+        selection['domain_starts'], selection['seg_starts'], selection['control_idx'],
+        response, evidence, selection['weights'], [r * ev for r, ev in target_scores]
+    )
+    if not len(positions):
+        return []
+
+    best = deltas.argmax(axis=1)
+    best_delta = deltas[np.arange(len(positions)), best]
+    order = np.argsort(-best_delta, kind="stable")
+    order = order[best_delta[order] > 0][:top_k]
+    results = []
+    for i in order.tolist():
+        q_id = catalog.control_ids[positions[i]]
+        results.append({
+            "question_id": q_id,
+            "nist_function": catalog.index[q_id]['nist_function'],
+            "target": targets[best[i]][0],
+            "delta": float(best_delta[i]),
+            "deltas": {r: float(d) for (r, _), d in zip(targets, deltas[i].tolist())}
+        })
+    return results
+
+def get_v2_metrics_reference(answers_map: Dict[str, Dict[str, Any]], scope="org", project_type="cloud", selected_frameworks=None, catalog=None) -> List[scoring.DomainMetrics]:
+    """
+    Same as get_v2_metrics through the per-question scoring functions.
+    Kept as the reference implementation the vectorized kernel is checked against.
+    """
+    catalog = catalog or data.get_catalog()
+    table = catalog.table
+    waves = table['wave'].to_numpy()
+
+    subcats_by_func = {}
+    for run in _select_runs(catalog, scope, project_type, selected_frameworks):
+        subcats_by_func.setdefault(table['func'].iat[run[0]], []).append(run)
+
+    domain_metrics_list = []
+    for nist_func, subcat_runs in subcats_by_func.items():
         subcategories_data = []
-        
-        for subcat_id, subcat_val in subcats.items():
+        for run in subcat_runs:
+            subcat_id = table['subcat'].iat[run[0]]
             questions = []
-            for ctrl in subcat_val.get('csa_controls', []):
-                # Framework Filtering
-                if selected_frameworks:
-                    # If any of the control's frameworks matches selected_frameworks
-                    ctrl_fws = ctrl.get('frameworks', [])
-                    if not any(fw in selected_frameworks for fw in ctrl_fws):
-                        continue
-
+            for r in run:
+                ctrl = table['control'].iat[r]
                 questions.append({
                     'question_id': ctrl['id'],
                     'text': ctrl['text'],
-                    'help': ctrl.get('help', ''),
+                    'help': catalog.get_help(ctrl['id']),
                     'domain': ctrl.get('domain', ''), 
                     'wave': ctrl.get('wave', 1),
                     'frameworks': ctrl.get('frameworks', [])
                 })
-            
-            if not questions:
-                continue
 
-            wave_avg = sum([q['wave'] for q in questions]) / len(questions) if questions else 2
-            criticality = "High" if wave_avg <= 1.5 else ("Medium" if wave_avg <= 2.5 else "Low")
-            
             subcategories_data.append({
                 'id': subcat_id,
                 'name': subcat_id, 
                 'questions': questions,
-                'criticality': criticality,
+                'criticality': _criticality(waves[run].mean()),
                 'weight': 1.0 
             })
-            
-        if subcategories_data:
-            domain_metrics = scoring.calculate_domain_metrics(
-                domain_id=domain_id,
-                domain_name=domain_name,
-                nist_function=nist_func,
-                subcategories_data=subcategories_data,
-                answers_map=answers_map
-            )
-            domain_metrics_list.append(domain_metrics)
-            
+
+        domain_metrics_list.append(scoring.calculate_domain_metrics(
+            domain_id=nist_func,
+            domain_name=NIST_NAMES.get(nist_func, nist_func),
+            nist_function=nist_func,
+            subcategories_data=subcategories_data,
+            answers_map=answers_map
+        ))
+
     return domain_metrics_list
 
 def get_overall_metrics(domain_metrics: List[scoring.DomainMetrics]) -> Dict[str, Any]:
@@ -0,0 +1,368 @@
+from collections import ChainMap
+from functools import lru_cache
+from types import MappingProxyType
+import numpy as np
+import pandas as pd
+
+# Catalog Layer
+# Precompiled, read-only views over the loaded assessment data.
+# A columnar control table (one row per subcategory/control pair) is built when
+# a catalog is loaded; scope, wave and framework filters are boolean masks over it.
+# Views are built once per (scope tag, wave), so the render path only performs a
+# dictionary lookup.
+
+SCOPE_TAGS = ("org", "project_cloud", "project_saas")
+WAVES = (None, 1, 2, 3)
+DEFAULT_WAVE = 2
+
+# Heavy text fields are left out of the views and fetched by key from the TextStore
+# (the text is only kept out of memory for snapshot-backed catalogs)
+HEAVY_SUBCAT_FIELDS = ('description',)
+HEAVY_CONTROL_FIELDS = ('help',)
+TEXT_CACHE_SIZE = 512
+
+def resolve_scope_tag(scope="org", project_type="cloud"):
+    """Map the (scope, project_type) pair used by the UI to a DOMAIN_SCOPES tag."""
+    if scope == "project":
+        return f"project_{project_type}"
+    return "org"
+
+def is_control_in_scope(control, target_tag, domain_scopes):
+    domain = control.get('domain', '')
+    allowed_tags = domain_scopes.get(domain, SCOPE_TAGS) # Default to all if unknown
+
+    # Special Handling for SaaS vs Cloud nuances even if domain matches
+    if target_tag == "project_saas" and domain == "Datacenter Security":
+        return False # Hard exclude physical for SaaS
+
+    return target_tag in allowed_tags
+
+def _freeze_control(control):
+    # Plain dicts (JSON) are copied once; snapshot records are already read-only
+    if not isinstance(control, dict):
+        return control
+    control = dict(control)
+    if 'frameworks' in control:
+        control['frameworks'] = tuple(control['frameworks'])
+    return MappingProxyType(control)
+
+def _with_controls(subcat_val, controls):
+    # Overlay the control tuple instead of copying fields, so lazily decoded
+    # snapshot descriptions are not materialized by building a view
+    return MappingProxyType(ChainMap({'csa_controls': controls}, subcat_val))
+
+def freeze_catalog(assessment_data):
+    """
+    Returns a read-only copy of the catalog tree.
+    Control objects are frozen once and shared by every view built from it.
+    """
+    frozen = {}
+    for func, subcats in assessment_data.items():
+        frozen_subcats = {}
+        for subcat_key, subcat_val in subcats.items():
+            controls = tuple(_freeze_control(c) for c in subcat_val.get('csa_controls', []))
+            frozen_subcats[subcat_key] = _with_controls(subcat_val, controls)
+        frozen[func] = MappingProxyType(frozen_subcats)
+    return MappingProxyType(frozen)
+
+def split_subcat_runs(table, rows):
+    """
+    Splits selected row positions into one array per subcategory.
+    Rows are in catalog order, so each subcategory is one contiguous run.
+    """
+    if not len(rows):
+        return []
+    subcat_codes = table['subcat'].cat.codes.to_numpy()[rows]
+    return np.split(rows, np.flatnonzero(np.diff(subcat_codes)) + 1)
+
+def _view_from_rows(table, rows):
+    """Rebuild the nested {func: {subcat: ...}} view for the selected table rows."""
+    # Columns are read once; per-row .iat lookups dominated the catalog build
+    funcs = table['func'].to_numpy()
+    subcats = table['subcat'].to_numpy()
+    controls = table['control'].to_numpy()
+    sources = table['subcat_source'].to_numpy()
+    view = {}
+    for run in split_subcat_runs(table, rows):
+        first = run[0]
+        view.setdefault(funcs[first], {})[subcats[first]] = _with_controls(sources[first], tuple(controls[run].tolist()))
+    return MappingProxyType({func: MappingProxyType(subcats) for func, subcats in view.items()})
+
+# --- Heavy Text Side Store ---
+
+def _light_record(rec, heavy_fields):
+    if hasattr(rec, 'without'):
+        return rec.without(*heavy_fields) # Snapshot record: stays lazy
+    return MappingProxyType({k: v for k, v in rec.items() if k not in heavy_fields})
+
+def strip_heavy_fields(frozen_data):
+    """
+    Same tree without HEAVY_SUBCAT_FIELDS / HEAVY_CONTROL_FIELDS.
+    Each control gets one light record, shared by every subcategory listing it.
+    """
+    light_controls = {}
+    light = {}
+    for func, subcats in frozen_data.items():
+        light_subcats = {}
+        for subcat_key, subcat_val in subcats.items():
+            controls = []
+            for c in subcat_val['csa_controls']:
+                if c['id'] not in light_controls:
+                    light_controls[c['id']] = _light_record(c, HEAVY_CONTROL_FIELDS)
+                controls.append(light_controls[c['id']])
+            fields = {k: subcat_val[k] for k in subcat_val if k not in HEAVY_SUBCAT_FIELDS and k != 'csa_controls'}
+            light_subcats[subcat_key] = _with_controls(fields, tuple(controls))
+        light[func] = MappingProxyType(light_subcats)
+    return MappingProxyType(light)
+
+class TextStore:
+    """
+    Heavy text fields of one catalog (subcategory descriptions, control help),
+    fetched by key when rendered. Snapshot records decode strings on access,
+    so recent lookups are kept in an LRU. Only snapshot-backed catalogs save memory
+    here: JSON catalogs are parsed whole, so their text stays in the records this holds.
+    """
+
+    def __init__(self, frozen_data):
+        self._subcats = {}
+        self._controls = {}
+        for subcats in frozen_data.values():
+            for subcat_key, subcat_val in subcats.items():
+                self._subcats.setdefault(subcat_key, subcat_val)
+                for c in subcat_val['csa_controls']:
+                    self._controls.setdefault(c['id'], c)
+        self.get_description = lru_cache(maxsize=TEXT_CACHE_SIZE)(self._description)
+        self.get_help = lru_cache(maxsize=TEXT_CACHE_SIZE)(self._help)
+
+    def _description(self, subcat_key):
+        rec = self._subcats.get(subcat_key)
+        return rec.get('description', '') if rec is not None else ''
+
+    def _help(self, control_id):
+        rec = self._controls.get(control_id)
+        return rec.get('help', '') if rec is not None else ''
+
+# --- Control Table ---
+
+def build_control_table(frozen_data, domain_scopes, control_ids, frameworks):
+    """
+    Columnar table with one row per (subcategory, control) pair, in catalog order:
+    func / subcat / domain codes, control index, wave, scope bitmask and framework bitmask.
+    """
+    control_pos = {c_id: i for i, c_id in enumerate(control_ids)}
+    fw_bits = {fw: 1 << i for i, fw in enumerate(frameworks)}
+    records = []
+    for func, subcats in frozen_data.items():
+        for subcat_key, subcat_val in subcats.items():
+            for c in subcat_val['csa_controls']:
+                fw_mask = 0
+                for fw in c.get('frameworks', ()):
+                    fw_mask |= fw_bits[fw]
+                records.append((func, subcat_key, c['id'], control_pos[c['id']], c.get('domain', ''),
+                                c.get('wave', DEFAULT_WAVE), fw_mask, c, subcat_val))
+
+    table = pd.DataFrame(records, columns=['func', 'subcat', 'control_id', 'control_idx', 'domain',
+                                           'wave', 'framework_mask', 'control', 'subcat_source'])
+    for col in ('func', 'subcat', 'domain'):
+        table[col] = pd.Categorical(table[col], categories=list(dict.fromkeys(table[col])))
+    table['control_idx'] = table['control_idx'].astype(np.int32)
+    table['wave'] = table['wave'].astype(np.int8)
+    table['framework_mask'] = table['framework_mask'].astype(np.int64)
+
+    # Scope tags resolve per domain once, then broadcast to rows by domain code
+    domain_masks = np.array([
+        sum(1 << bit for bit, tag in enumerate(SCOPE_TAGS) if is_control_in_scope({'domain': d}, tag, domain_scopes))
+        for d in table['domain'].cat.categories
+    ], dtype=np.uint8)
+    table['scope_mask'] = domain_masks[table['domain'].cat.codes.to_numpy()] if len(table) else np.zeros(0, np.uint8)
+    return table
+
+def scope_bit(target_tag):
+    """Bit for a scope tag; tags outside SCOPE_TAGS fall back to the per-domain check."""
+    return 1 << SCOPE_TAGS.index(target_tag) if target_tag in SCOPE_TAGS else None
+
+# --- Control Index ---
+
+INDEX_COLUMNS = ['control_id', 'text', 'help', 'domain', 'wave', 'nist_function', 'nist_subcat', 'nist_subcats']
+
+_INDEX_DEFAULTS = {'text': '', 'help': '', 'domain': '', 'wave': DEFAULT_WAVE, 'frameworks': ()}
+
+def build_control_index(frozen_data):
+    """
+    Maps control ID -> read-only record with its text, help, domain, wave and
+    every NIST subcategory it belongs to (in catalog order; the first is the primary one).
+    Records layer over the frozen controls, so no control text is copied.
+    """
+    controls = {}
+    placement = {}
+    for func, subcats in frozen_data.items():
+        for subcat_key, subcat_val in subcats.items():
+            for c in subcat_val['csa_controls']:
+                c_id = c['id']
+                if c_id not in controls:
+                    controls[c_id] = c
+                    placement[c_id] = {'nist_function': func, 'nist_subcats': []}
+                if subcat_key not in placement[c_id]['nist_subcats']:
+                    placement[c_id]['nist_subcats'].append(subcat_key)
+
+    index = {}
+    for c_id, c in controls.items():
+        extra = placement[c_id]
+        extra['nist_subcats'] = tuple(extra['nist_subcats'])
+        index[c_id] = MappingProxyType(ChainMap(extra, c, _INDEX_DEFAULTS))
+    return MappingProxyType(index)
+
+def build_index_frame(control_index):
+    """Columnar form of the control index, used for bulk DataFrame merges."""
+    rows = [
+        (c_id, rec['text'], rec['help'], rec['domain'], rec['wave'],
+         rec['nist_function'], rec['nist_subcats'][0], rec['nist_subcats'])
+        for c_id, rec in control_index.items()
+    ]
+    return pd.DataFrame(rows, columns=INDEX_COLUMNS)
+
+# --- Language Overlays ---
+# The catalog is stored as one language-neutral base (IDs, domain, wave,
+# subcategory membership) plus one text overlay per language. Overlays for
+# additional languages only carry the strings that differ from BASE_LANG.
+
+BASE_LANG = "en"
+
+def split_catalog(tree):
+    """Split a full {func: {subcat: {...}}} tree into (base, overlay)."""
+    base = {'controls': {}, 'structure': {}}
+    overlay = {'controls': {}, 'subcategories': {}}
+    for func, subcats in tree.items():
+        base['structure'][func] = {}
+        for subcat_key, subcat_val in subcats.items():
+            ids = []
+            for c in subcat_val.get('csa_controls', []):
+                c_id = c['id']
+                ids.append(c_id)
+                if c_id not in base['controls']:
+                    base['controls'][c_id] = {k: v for k, v in c.items() if k not in ('id', 'text', 'help')}
+                    overlay['controls'][c_id] = {'text': c.get('text', ''), 'help': c.get('help', '')}
+            base['structure'][func][subcat_key] = ids
+            overlay['subcategories'][subcat_key] = subcat_val.get('description', '')
+    return base, overlay
+
+def strip_overlay(overlay, fallback):
+    """Keep only the strings of overlay that differ from the fallback overlay."""
+    stripped = {'controls': {}, 'subcategories': {}}
+    for c_id, fields in overlay.get('controls', {}).items():
+        ref = fallback.get('controls', {}).get(c_id, {})
+        changed = {k: v for k, v in fields.items() if ref.get(k) != v}
+        if changed:
+            stripped['controls'][c_id] = changed
+    for subcat_key, desc in overlay.get('subcategories', {}).items():
+        if fallback.get('subcategories', {}).get(subcat_key) != desc:
+            stripped['subcategories'][subcat_key] = desc
+    return stripped
+
+def compose_catalog(base, *overlays):
+    """
+    Rebuild the full tree from the base and one or more overlays.
+    For every string, the first overlay that defines it wins.
+    """
+    controls = {}
+    for c_id, fields in base['controls'].items():
+        text = {}
+        for ov in reversed(overlays):
+            text.update(ov.get('controls', {}).get(c_id, {}))
+        controls[c_id] = {'id': c_id, 'text': text.get('text', ''), 'help': text.get('help', ''), **fields}
+
+    descriptions = {}
+    for ov in reversed(overlays):
+        descriptions.update(ov.get('subcategories', {}))
+
+    tree = {}
+    for func, subcats in base['structure'].items():
+        tree[func] = {
+            subcat_key: {
+                'description': descriptions.get(subcat_key, ''),
+                'csa_controls': [controls[c_id] for c_id in ids]
+            }
+            for subcat_key, ids in subcats.items()
+        }
+    return tree
+
+# --- Catalog Object ---
+
+class Catalog:
+    """
+    One language's catalog: read-only tree, control table, precompiled scope views and control index.
+    Loaded once per language and shared by every session; sessions only hold a reference.
+    Views carry light records only; descriptions and help text come from get_description / get_help.
+    """
+
+    def __init__(self, lang, tree, domain_scopes, version=None, stamp=None):
+        self.lang = lang
+        self.domain_scopes = domain_scopes
+        self.version = version # Content hash of the source files (see data.get_catalog_version)
+        self.stamp = stamp     # File stat stamp when built (data._STAMPS holds the latest seen)
+        full = freeze_catalog(tree)
+        self.texts = TextStore(full)
+        self.index = build_control_index(full) # Index records keep every field
+        self.data = strip_heavy_fields(full)
+        self.control_ids = tuple(self.index)
+        self.control_pos = {c_id: i for i, c_id in enumerate(self.control_ids)} # ID -> position in control_ids
+        self.frameworks = tuple(dict.fromkeys(
+            fw for rec in self.index.values() for fw in rec.get('frameworks', ())
+        ))
+        self.table = build_control_table(self.data, domain_scopes, self.control_ids, self.frameworks)
+        self._scope_mask = self.table['scope_mask'].to_numpy()
+        self._wave = self.table['wave'].to_numpy()
+        self._framework_mask = self.table['framework_mask'].to_numpy()
+        # "{subcat}_{control_id}" per row: the suffix of the UI widget keys
+        self.row_keys = (self.table['subcat'].astype(str) + "_" + self.table['control_id']).to_numpy()
+        self._views = {
+            (tag, wave): _view_from_rows(self.table, self.select_rows(scope_tag=tag, wave=wave))
+            for tag in SCOPE_TAGS
+            for wave in WAVES
+        }
+        self._index_frame = None # Built lazily on first bulk lookup
+
+    def row_mask(self, scope="org", project_type="cloud", wave=None, frameworks=None, scope_tag=None):
+        """Boolean mask over table rows for a scope, optional wave and optional framework selection."""
+        target_tag = scope_tag or resolve_scope_tag(scope, project_type)
+        bit = scope_bit(target_tag)
+        if bit is not None:
+            mask = (self._scope_mask & bit) != 0
+        else:
+            mask = np.array([is_control_in_scope(c, target_tag, self.domain_scopes) for c in self.table['control']], dtype=bool)
+        if wave is not None:
+            mask &= self._wave == wave
+        if frameworks:
+            fw_bits = 0
+            for fw in frameworks:
+                if fw in self.frameworks:
+                    fw_bits |= 1 << self.frameworks.index(fw)
+            mask &= (self._framework_mask & fw_bits) != 0
+        return mask
+
+    def select_rows(self, scope="org", project_type="cloud", wave=None, frameworks=None, scope_tag=None):
+        """Table row positions (catalog order) matching row_mask."""
+        return np.flatnonzero(self.row_mask(scope, project_type, wave, frameworks, scope_tag))
+
+    def get_controls_for_scope(self, scope="org", project_type="cloud", wave=None):
+        target_tag = resolve_scope_tag(scope, project_type)
+        view = self._views.get((target_tag, wave))
+        if view is None:
+            # Non-standard tag or wave: compile once and keep it with this catalog
+            view = _view_from_rows(self.table, self.select_rows(wave=wave, scope_tag=target_tag))
+            self._views[(target_tag, wave)] = view
+        return view
+
+    def get_description(self, subcat_key):
+        return self.texts.get_description(subcat_key)
+
+    def get_help(self, control_id):
+        return self.texts.get_help(control_id)
+
+    def get_index_frame(self):
+        if self._index_frame is None:
+            self._index_frame = build_index_frame(self.index)
+        return self._index_frame
+
+    def get_total_controls(self):
+        return len(self.table)
@@ -1,7 +1,12 @@
 import json
 import os
+import threading
+import time
+import numpy as np
 
-from modules import i18n
+from modules import i18n, snapshot
+from modules.catalog import Catalog, BASE_LANG, compose_catalog
+from modules.responses import UNANSWERED, answered
 
 # Weighted Waves for Staged Assessment
 def get_maturity_waves():
@@ -21,13 +26,27 @@ def get_nist_functions():
         "CSA_EXTRA": i18n.t("nist_csa")
     }
 
-# Variable to hold the loaded data
-ASSESSMENT_DATA = {}
+# Catalog files: one language-neutral base plus one text overlay per language
+CATALOG_BASE_FILE = "catalog_base.json"
+CATALOG_OVERLAY_FILE = "catalog_{lang}.json"
+
+# Process-level catalog registry: one shared, read-only Catalog per language.
+# Sessions keep a reference (see get_catalog) instead of reloading module globals.
+_CATALOGS = {}
+_LOAD_LOCK = threading.Lock()
+
+# Hot reload: when a language's catalog files change on disk, a fresh Catalog is
+# built in a background thread and swapped into the registry. Sessions pick it up
+# on their next rerun; a run in progress keeps the Catalog it started with.
+RELOAD_CHECK_INTERVAL = 2.0 # Seconds between file stat checks per language
+_LAST_CHECK = {}
+_STAMPS = {} # lang -> file stat stamp last seen by a load or reload (written under _LOAD_LOCK)
+_RELOADING = set()
 
 # --- Scoping & Heuristics ---
 
 # Classify CSA Domains into Scopes
-# Keys match the 'domain' field in data.json
+# Keys match the 'domain' field in catalog_base.json
 DOMAIN_SCOPES = {
     # Organization Level (Macro)
     "Governance, Risk and Compliance": ["org"],
@@ -54,104 +73,174 @@ DOMAIN_SCOPES = {
 
 DEFAULT_PROJECT_TYPE = "project_cloud"
 
-def load_data():
-    global ASSESSMENT_DATA
-    # Look for data.json in CWD or parent of modules
-    paths = [
-        "data.json",
-        os.path.join(os.path.dirname(__file__), "..", "data.json")
-    ]
-    
-    loaded = False
-    
-    # Decide which file to load based on language
-    lang = i18n.get_lang()
-    data_file = "data_pt.json" if lang == "pt" else "data.json"
-    
-    paths = [
-        data_file,
-        os.path.join(os.path.dirname(__file__), "..", data_file),
-        "data.json", # Fallback
-        os.path.join(os.path.dirname(__file__), "..", "data.json")
-    ]
-    
-    for p in paths:
+def _find_catalog_file(name):
+    # Look in CWD or parent of modules
+    for p in [name, os.path.join(os.path.dirname(__file__), "..", name)]:
         if os.path.exists(p):
+            return p
+    return None
+
+def get_catalog_sources(lang):
+    """
+    Existing catalog files for a language, in precedence order:
+    base, language overlay, base-language overlay (fallback for untranslated strings).
+    """
+    base = _find_catalog_file(CATALOG_BASE_FILE)
+    if base is None:
+        return []
+    sources = [base]
+    for overlay_lang in dict.fromkeys([lang, BASE_LANG]):
+        overlay = _find_catalog_file(CATALOG_OVERLAY_FILE.format(lang=overlay_lang))
+        if overlay:
+            sources.append(overlay)
+    return sources
+
+def read_catalog_tree(sources):
+    """Compose the full tree from get_catalog_sources() output. Returns (tree, raw_bytes)."""
+    raw_parts = []
+    parsed = []
+    for p in sources:
+        with open(p, 'rb') as f:
+            raw = f.read()
+        raw_parts.append(raw)
+        parsed.append(json.loads(raw))
+    return compose_catalog(parsed[0], *parsed[1:]), b"".join(raw_parts)
+
+def get_catalog_stamp(sources):
+    """Cheap change detector: (path, mtime_ns, size) of every source file."""
+    stamp = []
+    for p in sources:
+        try:
+            info = os.stat(p)
+            stamp.append((p, info.st_mtime_ns, info.st_size))
+        except OSError:
+            stamp.append((p, None, None))
+    return tuple(stamp)
+
+def get_catalog_version(sources):
+    """Content hash of the source files, e.g. '1a2b3c4d-204800'."""
+    raw_parts = []
+    for p in sources:
+        with open(p, 'rb') as f:
+            raw_parts.append(f.read())
+    crc, size = snapshot.source_fingerprint(b"".join(raw_parts))
+    return f"{crc:08x}-{size}"
+
+def build_catalog(lang):
+    """Build (without registering) the catalog for a language from its snapshot or JSON."""
+    sources = get_catalog_sources(lang)
+    # Stamp before reading: a write that lands mid-load is caught by the next check
+    stamp = get_catalog_stamp(sources)
+    version = None
+
+    tree = {}
+    if not sources:
+        print(f"WARNING: {CATALOG_BASE_FILE} not found. Ensure ingest.py has been run.")
+    else:
+        version = get_catalog_version(sources)
+        # Prefer the memory-mapped snapshot emitted by ingest.py; JSON is the fallback
+        snap_path = snapshot.snapshot_path(CATALOG_OVERLAY_FILE.format(lang=lang))
+        snap_path = os.path.join(os.path.dirname(sources[0]), snap_path)
+        tree = snapshot.load_snapshot(snap_path, sources)
+        if tree is None:
             try:
-                with open(p, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    ASSESSMENT_DATA = data # Overwrite instead of update for clean switch
-                loaded = True
-                break
+                tree, _ = read_catalog_tree(sources)
             except Exception as e:
-                print(f"Error loading {p}: {e}")
-    
-    if not loaded:
-        print("WARNING: data.json not found. Ensure ingest.py has been run.")
+                print(f"Error loading catalog for '{lang}': {e}")
+                tree = {}
 
-# Load on import
-load_data()
+    return Catalog(lang, tree, DOMAIN_SCOPES, version=version, stamp=stamp)
 
-def get_total_controls():
-    count = 0
-    for func in ASSESSMENT_DATA:
-        for subcat in ASSESSMENT_DATA[func]:
-            if 'csa_controls' in ASSESSMENT_DATA[func][subcat]:
-                count += len(ASSESSMENT_DATA[func][subcat]['csa_controls'])
-    return count
+def load_data(lang=None):
+    """Load the catalog for a language and register it."""
+    lang = lang or BASE_LANG
+    cat = build_catalog(lang)
+    _CATALOGS[lang] = cat
+    _STAMPS[lang] = cat.stamp
+    return cat
 
-# Track current loaded language
-CURRENT_LOADED_LANG = None
+def _reload_catalog(lang, current):
+    """Background worker: rebuild the catalog and swap it in if its content changed."""
+    try:
+        fresh = build_catalog(lang)
+        with _LOAD_LOCK:
+            _STAMPS[lang] = fresh.stamp
+            if fresh.version == current.version:
+                return # Touched but identical; keep the loaded catalog
+            _CATALOGS[lang] = fresh
+        print(f"Catalog '{lang}' reloaded: {current.version} -> {fresh.version}")
+    except Exception as e:
+        print(f"Error reloading catalog for '{lang}': {e}")
+    finally:
+        with _LOAD_LOCK:
+            _RELOADING.discard(lang)
 
-def get_controls_for_scope(scope="org", project_type="cloud"):
+def check_for_update(cat):
     """
-    Returns a filtered view of ASSESSMENT_DATA based on scope.
-    Now reacts to language changes by reloading data if necessary.
+    Stat the catalog's source files (at most every RELOAD_CHECK_INTERVAL seconds) and
+    start a background reload when they changed. Returns True if a reload was started.
     """
-    global CURRENT_LOADED_LANG
-    
-    # Check if we need to reload due to language change
-    if i18n.get_lang() != CURRENT_LOADED_LANG:
-        load_data()
-        CURRENT_LOADED_LANG = i18n.get_lang()
-        
-    target_tag = "org"
-    if scope == "project":
-        target_tag = f"project_{project_type}"
-        
-    filtered_data = {}
-    
-    for func, subcats in ASSESSMENT_DATA.items():
-        filtered_subcats = {}
-        for subcat_key, subcat_val in subcats.items():
-            
-            # Filter controls within this subcategory
-            original_controls = subcat_val.get('csa_controls', [])
-            valid_controls = []
-            
-            for c in original_controls:
-                domain = c.get('domain', '')
-                allowed_tags = DOMAIN_SCOPES.get(domain, ["org", "project_cloud", "project_saas"]) # Default to all if unknown
-                
-                # Logic:
-                # 1. If target is 'org', allow if 'org' in tags.
-                # 2. If target is 'project_cloud', allow if 'project_cloud' in tags.
-                # 3. If target is 'project_saas', allow if 'project_saas' in tags.
-                
-                # Special Handling for SaaS vs Cloud nuances even if domain matches
-                if target_tag == "project_saas" and domain == "Datacenter Security":
-                    continue # Hard exclude physical for SaaS
-                    
-                if target_tag in allowed_tags:
-                    valid_controls.append(c)
-            
-            if valid_controls:
-                # Create copy of subcat with filtered controls
-                new_subcat = subcat_val.copy()
-                new_subcat['csa_controls'] = valid_controls
-                filtered_subcats[subcat_key] = new_subcat
-        
-        if filtered_subcats:
-            filtered_data[func] = filtered_subcats
-            
-    return filtered_data
+    now = time.monotonic()
+    if now - _LAST_CHECK.get(cat.lang, 0.0) < RELOAD_CHECK_INTERVAL:
+        return False
+    _LAST_CHECK[cat.lang] = now
+
+    stamp = get_catalog_stamp(get_catalog_sources(cat.lang))
+    with _LOAD_LOCK:
+        if stamp == _STAMPS.get(cat.lang, cat.stamp) or cat.lang in _RELOADING:
+            return False
+        _RELOADING.add(cat.lang)
+    threading.Thread(target=_reload_catalog, args=(cat.lang, cat),
+                     name=f"catalog-reload-{cat.lang}", daemon=True).start()
+    return True
+
+def get_catalog(lang=None):
+    """
+    Returns the shared Catalog for a language (default: session language),
+    loading it on first use and scheduling a hot reload if its files changed.
+    """
+    lang = lang or i18n.get_lang()
+    cat = _CATALOGS.get(lang)
+    if cat is None:
+        with _LOAD_LOCK:
+            cat = _CATALOGS.get(lang) or load_data(lang)
+    else:
+        check_for_update(cat)
+    return cat
+
+# Load base language on import
+load_data(BASE_LANG)
+
+def get_total_controls(catalog=None):
+    return (catalog or get_catalog()).get_total_controls()
+
+def get_control_index(catalog=None):
+    """Returns the read-only control ID -> record index (default: session language catalog)."""
+    return (catalog or get_catalog()).index
+
+def get_control_index_frame(catalog=None):
+    """Returns the control index as a DataFrame (one row per control ID)."""
+    return (catalog or get_catalog()).get_index_frame()
+
+def get_controls_for_scope(scope="org", project_type="cloud", wave=None, catalog=None):
+    """
+    Returns a read-only filtered view of the catalog based on scope (and optionally wave).
+    Views are precompiled when the catalog is loaded.
+    """
+    return (catalog or get_catalog()).get_controls_for_scope(scope, project_type, wave)
+
+def get_progress(responses, scope="org", project_type="cloud", wave=None, catalog=None):
+    """
+    (completed, total) controls for a scope view, read straight from the control table.
+    responses is a ResponseStore, or a dict keyed by the widget keys
+    score_{scope}_{project_type}_{subcat}_{control_id}. A control counts as completed
+    when responses.answered holds for its score (Not Implemented included).
+    """
+    cat = catalog or get_catalog()
+    rows = cat.select_rows(scope, project_type, wave)
+    if hasattr(responses, 'scores'):
+        scores = responses.scores(scope, project_type)
+        return int(np.count_nonzero(answered(scores[cat.table['control_idx'].to_numpy()[rows]]))), len(rows)
+    prefix = f"score_{scope}_{project_type}_"
+    completed = sum(1 for key in cat.row_keys[rows] if answered(responses.get(prefix + key, UNANSWERED)))
+    return completed, len(rows)
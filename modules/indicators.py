@@ -1,8 +1,18 @@
-from typing import Dict, List, Any
+from typing import Dict
+import json
+import os
+import re
+import threading
+import numpy as np
 import streamlit as st
+from modules import responses
+
+# Optional JSON file with the same shape as DEFAULT_INDICATORS_CONFIG; its domain
+# lists replace the built-in ones, so indicators can be added without a code change
+INDICATORS_FILE = "indicators.json"
 
 # Keyword definitions from ai-assess-insight
-INDICATORS_CONFIG = {
+DEFAULT_INDICATORS_CONFIG = {
     'AI_SECURITY': [
         {
             'id': 'model-risks',
@@ -39,45 +49,117 @@ INDICATORS_CONFIG = {
     ]
 }
 
-def calculate_indicators(questions: List[Dict[str, Any]], answers_map: Dict[str, Any], domain_key="AI_SECURITY"):
+
+def load_indicators_config(path=INDICATORS_FILE):
+    """Built-in indicators, with each domain list overridden by path when it exists."""
+    config = dict(DEFAULT_INDICATORS_CONFIG)
+    for p in [path, os.path.join(os.path.dirname(__file__), "..", path)]:
+        if os.path.exists(p):
+            try:
+                with open(p, "r", encoding="utf-8") as f:
+                    config.update(json.load(f))
+            except Exception as e:
+                print(f"Error loading indicators config {p}: {e}")
+            break
+    return config
+
+INDICATORS_CONFIG = load_indicators_config()
+
+# --- Keyword Matcher ---
+# Membership of every catalog control in every indicator is computed once per
+# (catalog version, language, domain) with one compiled pattern and kept as index arrays.
+
+_INDEX_CACHE = {}
+_INDEX_LOCK = threading.Lock()
+
+def reload_indicators_config(path=INDICATORS_FILE):
+    global INDICATORS_CONFIG
+    INDICATORS_CONFIG = load_indicators_config(path)
+    with _INDEX_LOCK:
+        _INDEX_CACHE.clear()
+
+class KeywordMatcher:
+    """
+    Matches all indicators' keywords in one pass. Keywords must start on a word
+    boundary ('ml' does not match inside 'html') but may be followed by any suffix,
+    so plurals still match. The alternation sits in a lookahead and is ordered
+    longest first, so overlapping keywords ('prompt injection' / 'prompt') are all seen.
+    """
+
+    def __init__(self, indicators):
+        owners = {}
+        for i, indicator in enumerate(indicators):
+            for kw in indicator['keywords']:
+                owners.setdefault(kw.lower(), set()).add(i)
+        keywords = sorted(owners, key=len, reverse=True)
+        # The longest keyword at a position implies every shorter keyword that prefixes it
+        self._owners = {kw: frozenset().union(*(owners[k] for k in owners if kw.startswith(k))) for kw in keywords}
+        self._pattern = re.compile(r"(?<!\w)(?=(" + "|".join(map(re.escape, keywords)) + "))") if keywords else None
+
+    def match(self, text):
+        """Indicator positions whose keywords occur in text."""
+        found = set()
+        if self._pattern is not None:
+            for m in self._pattern.finditer(text.lower()):
+                found |= self._owners[m.group(1)]
+        return found
+
+def _question_text(q):
+    return (q.get('text', '') or '') + ' ' + (q.get('help', '') or '')
+
+def get_indicator_index(catalog, domain_key="AI_SECURITY") -> Dict[str, np.ndarray]:
+    """Indicator id -> sorted control positions (catalog.control_ids) whose text or help matches it."""
+    key = (catalog.lang, catalog.version, domain_key)
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        config = INDICATORS_CONFIG.get(domain_key, INDICATORS_CONFIG['AI_SECURITY'])
+        matcher = KeywordMatcher(config)
+        members = [[] for _ in config]
+        for pos, c_id in enumerate(catalog.control_ids):
+            for i in matcher.match(_question_text(catalog.index[c_id])):
+                members[i].append(pos)
+        index = {ind['id']: np.array(m, dtype=np.int64) for ind, m in zip(config, members)}
+        with _INDEX_LOCK:
+            # Entries of replaced catalogs are dropped with them
+            for stale in [k for k in _INDEX_CACHE if k[:2] != key[:2]]:
+                del _INDEX_CACHE[stale]
+            _INDEX_CACHE[key] = index
+    return index
+
+def calculate_indicators(scores, domain_key="AI_SECURITY", catalog=None, control_idx=None):
     """
-    Groups questions by keywords and calculates maturity for each group.
+    Maturity per indicator, as a masked reduction of a score vector over the precomputed
+    indicator index. scores is aligned to catalog.control_ids (ResponseStore.scores; negative
+    = unanswered, counted as 0). control_idx holds the control position of each selected table
+    row, so a control listed in several selected subcategories counts once per listing;
+    by default every catalog control counts once. percentage is relative to MAX_SCORE.
     """
     config = INDICATORS_CONFIG.get(domain_key, INDICATORS_CONFIG['AI_SECURITY'])
-    results = []
+    if catalog is None:
+        from modules import data
+        catalog = data.get_catalog()
+    index = get_indicator_index(catalog, domain_key)
+
+    n_controls = len(catalog.control_ids)
+    values = np.maximum(np.asarray(scores, dtype=np.float64), 0.0)
+    if control_idx is None:
+        counts = np.ones(n_controls, dtype=np.int64)
+    else:
+        counts = np.bincount(np.asarray(control_idx, dtype=np.int64), minlength=n_controls)
 
+    results = []
     for indicator in config:
-        matched_questions = []
-        for q in questions:
-            q_text = (q.get('text', '') + ' ' + q.get('help', '')).lower()
-            if any(kw in q_text for kw in indicator['keywords']):
-                matched_questions.append(q)
-        
-        if not matched_questions:
+        members = index.get(indicator['id'], np.zeros(0, np.int64))
+        weight = counts[members]
+        total = int(weight.sum())
+        if not total:
             continue
-            
-        answered_count = 0
-        total_score = 0.0
-        
-        for q in matched_questions:
-            q_id = q.get('question_id') or q.get('id')
-            # Look for answer in session state or map
-            ans_val = answers_map.get(f"score_{q_id}", 0) or answers_map.get(q_id, 0)
-            if isinstance(ans_val, str):
-                # Handle string responses if any
-                score_map = {"Sim": 1.0, "Parcial": 0.5, "Não": 0.0}
-                ans_val = score_map.get(ans_val, 0.0)
-            
-            if ans_val > 0:
-                answered_count += 1
-                total_score += ans_val
-        
-        percentage = (total_score / len(matched_questions)) * 100
+        member_values = values[members]
         results.append({
             **indicator,
-            'value': answered_count,
-            'total': len(matched_questions),
-            'percentage': percentage
+            'value': int(weight[member_values > 0].sum()),
+            'total': total,
+            'percentage': float((member_values * weight).sum() / (total * responses.MAX_SCORE)) * 100
         })
-    
+
     return results
@@ -1,246 +1,289 @@
 import pandas as pd
 import json
-import re
 import os
+import sys
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from modules import snapshot, catalog, data, sources
 
 NIST_CSV = "nist_ai_rmf_playbook.csv"
 CSA_EXCEL = "AICMv1.0.3-generated_at_2025_11_10.xlsx"
-OUTPUT_FILE = "data.json"
+# Outputs: language-neutral base + English text overlay.
+# Other languages are hand-maintained overlays (catalog_<lang>.json) holding only translated strings.
+BASE_OUTPUT_FILE = data.CATALOG_BASE_FILE
+OVERLAY_OUTPUT_FILE = data.CATALOG_OVERLAY_FILE.format(lang=catalog.BASE_LANG)
+# Machine-readable list of added / removed / changed controls of the last run
+DIFF_OUTPUT_FILE = "ingest_diff.json"
 
-def normalize_nist_mapping(mapping_str):
+# Incremental builds: source content hashes of the last build
+MANIFEST_FILE = os.path.join(sources.CACHE_DIR, "manifest.json")
+
+CONTROL_FIELDS = ['id', 'text', 'help', 'domain', 'wave', 'frameworks']
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable {MANIFEST_FILE}: {e}")
+        return {}
+
+def save_manifest(hashes):
+    os.makedirs(sources.CACHE_DIR, exist_ok=True)
+    with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"cache_version": sources.CACHE_VERSION, "sources": hashes}, f, indent=2)
+
+# --- Catalog Diff ---
+
+def read_catalog_outputs():
+    """The (base, overlay) pair written by the previous run, or empty dicts."""
+    out = []
+    for path in (BASE_OUTPUT_FILE, OVERLAY_OUTPUT_FILE):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            out.append({})
+    return tuple(out)
+
+def _flatten_controls(base, overlay):
+    """{control_id: {field: value, ..., 'nist_subcats': [...]}} from a base/overlay pair."""
+    controls = {}
+    texts = overlay.get('controls', {})
+    for c_id, fields in base.get('controls', {}).items():
+        controls[c_id] = {**fields, **texts.get(c_id, {}), 'nist_subcats': []}
+    for subcats in base.get('structure', {}).values():
+        for subcat_key, ids in subcats.items():
+            for c_id in ids:
+                if c_id in controls:
+                    controls[c_id]['nist_subcats'].append(subcat_key)
+    return controls
+
+def diff_catalogs(old, new):
     """
-    Convert 'GV-1.1-001', 'GOVERN 1.1', 'MP-1.2' to 'GOVERN 1.1', 'MAP 1.2' etc.
-    Returns a list of valid NIST Subcategories found.
+    Compare two (base, overlay) catalog pairs.
+    Returns {'added': [ids], 'removed': [ids], 'changed': {id: {field: {'old', 'new'}}}}.
     """
-    if not isinstance(mapping_str, str):
-        return []
-
-    mappings = []
-    
-    # Split by newlines or commas
-    tokens = re.split(r'[\n,]', mapping_str)
-    
-    for token in tokens:
-        token = token.strip().upper()
-        if not token:
-            continue
-            
-        # Detect Function
-        func = None
-        if "GV" in token or "GOVERN" in token: func = "GOVERN"
-        elif "MP" in token or "MAP" in token: func = "MAP"
-        elif "MS" in token or "MEASURE" in token: func = "MEASURE"
-        elif "MG" in token or "MANAGE" in token: func = "MANAGE"
-        
-        if func:
-            # Extract Number X.Y
-            # Regex to find X.Y (e.g., 1.1, 2.3)
-            match = re.search(r'(\d+\.\d+)', token)
-            if match:
-                number = match.group(1)
-                mappings.append(f"{func} {number}")
-                
-    return list(set(mappings))
-
-def ingest():
-    print("Starting ingestion...")
-    
-    # --- 1. Load NIST Structure (CSV) ---
-    if not os.path.exists(NIST_CSV):
-        print(f"Error: {NIST_CSV} not found.")
-        return
+    old_controls = _flatten_controls(*old)
+    new_controls = _flatten_controls(*new)
 
-    try:
-        nist_df = pd.read_csv(NIST_CSV)
-        print("NIST CSV loaded.")
-    except Exception as e:
-        print(f"Error reading {NIST_CSV}: {e}")
-        return
+    changed = {}
+    for c_id in sorted(old_controls.keys() & new_controls.keys()):
+        before, after = old_controls[c_id], new_controls[c_id]
+        fields = {k: {"old": before.get(k), "new": after.get(k)}
+                  for k in sorted(before.keys() | after.keys()) if before.get(k) != after.get(k)}
+        if fields:
+            changed[c_id] = fields
+
+    return {
+        "added": sorted(new_controls.keys() - old_controls.keys()),
+        "removed": sorted(old_controls.keys() - new_controls.keys()),
+        "changed": changed
+    }
 
-    # Create Base Structure
-    final_data = {
-        "GOVERN": {},
-        "MAP": {},
-        "MEASURE": {},
-        "MANAGE": {},
-        "CSA_EXTRA": {} 
+def write_diff(diff, source_status):
+    payload = {
+        "sources": source_status,
+        "summary": {k: len(diff[k]) for k in ("added", "removed", "changed")},
+        **diff
     }
-    
-    # Find about row
-    about_row_idx = -1
-    for idx, val in nist_df.iloc[:, 0].items():
-        if str(val) == "section_about":
-            about_row_idx = idx
-            break
-
-    # Build Skeleton
-    for col in nist_df.columns:
-        col_upper = str(col).upper()
-        if re.match(r'^(GOVERN|MAP|MEASURE|MANAGE)\s+\d+\.\d+$', col_upper):
-            func = col_upper.split()[0]
-            desc = ""
-            if about_row_idx != -1:
-                desc = str(nist_df.at[about_row_idx, col])
-                if desc == "nan": desc = ""
-            desc = desc.replace('"', '').strip()
-            
-            final_data[func][col_upper] = {
-                "description": desc,
-                "csa_controls": []
-            }
-            
-    print(f"NIST Skeleton built. Categories found: {sum(len(v) for v in final_data.values()) if 'CSA_EXTRA' not in final_data else sum(len(v) for k,v in final_data.items() if k!='CSA_EXTRA')}")
-
-    # --- 2. Load CSA Data ---
-    if not os.path.exists(CSA_EXCEL):
-        print(f"Error: {CSA_EXCEL} not found.")
+    with open(DIFF_OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    print(f"Diff saved to {DIFF_OUTPUT_FILE}: {payload['summary']}")
+
+# --- Source Parsing & Merge ---
+
+class StageTimer:
+    """Collects wall-clock time per pipeline stage for the end-of-run report."""
+    def __init__(self):
+        self.timings = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.perf_counter() - start, False))
+
+    def add_detail(self, name, seconds):
+        """Time spent inside the previous stage (e.g. one source in the worker pool)."""
+        self.timings.append((name, seconds, True))
+
+    def report(self):
+        total = sum(t for _, t, detail in self.timings if not detail)
+        print("Stage timings:")
+        for name, t, detail in self.timings:
+            print(f"  {'  ' if detail else ''}{name:<{22 if detail else 24}} {t * 1000:9.1f} ms")
+        print(f"  {'total':<24} {total * 1000:9.1f} ms")
+
+def parse_sources(source_list, hashes, use_cache, workers=None):
+    """Parse every source, in a process pool unless workers == 1. Results keep source order."""
+    workers = workers or min(len(source_list), os.cpu_count() or 1)
+    if workers <= 1:
+        return [sources.run_source(src, hashes, use_cache) for src in source_list]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(sources.run_source, src, hashes, use_cache) for src in source_list]
+        return [f.result() for f in futures]
+
+def merge_sources(source_list, results):
+    """
+    Merge parsed sources into the {func: {subcat: {description, csa_controls}}} tree.
+    Controls are deduped by ID (the first source and row win), except in CSA_EXTRA where a
+    control repeated under another domain is listed in each domain, as before. NIST targets
+    are the union over all sources, and every control carries the 'frameworks' that list it.
+    Returns (tree, mapped control IDs, extra control IDs).
+    """
+    final_data = {}
+    skeleton_frameworks = []
+    for src, res in zip(source_list, results):
+        if res["skeleton"] is not None:
+            skeleton_frameworks.append(src.framework)
+            for func, subcats in res["skeleton"].items():
+                for subcat_key, subcat_val in subcats.items():
+                    final_data.setdefault(func, {}).setdefault(subcat_key, subcat_val)
+    final_data.setdefault("CSA_EXTRA", {})
+
+    all_controls = pd.concat([res["controls"] for res in results], ignore_index=True)
+    targets = pd.concat([res["targets"] for res in results], ignore_index=True).drop_duplicates()
+    controls = all_controls.drop_duplicates('id').assign(pos=lambda df: np.arange(len(df)))
+
+    subcats = {k for func, subcat_map in final_data.items() if func != "CSA_EXTRA" for k in subcat_map}
+    mapped = controls.merge(targets, on='id', how='inner')
+    mapped = mapped[mapped['target'].isin(subcats)].sort_values('pos', kind='stable')
+
+    # Every framework listing a control; skeleton frameworks cover the controls mapped into them
+    tags = [all_controls[['id', 'framework']]]
+    for fw in skeleton_frameworks:
+        tags.append(pd.DataFrame({'id': mapped['id'].unique(), 'framework': fw}))
+    tags = pd.concat(tags, ignore_index=True).drop_duplicates()
+    frameworks = tags.groupby('id', sort=False)['framework'].agg(list)
+    controls = controls.assign(frameworks=controls['id'].map(frameworks))
+    mapped = mapped.assign(frameworks=mapped['id'].map(frameworks))
+
+    for target, group in mapped.groupby('target', sort=False):
+        final_data[target.split()[0]][target]['csa_controls'] = group[CONTROL_FIELDS].to_dict('records')
+
+    # Controls without any NIST mapping go to CSA_EXTRA, grouped by domain
+    extra = all_controls[~all_controls['id'].isin(targets['id'])].drop_duplicates(['extra_key', 'id'])
+    extra = extra.assign(frameworks=extra['id'].map(frameworks))
+    for d_key, group in extra.groupby('extra_key', sort=False):
+        final_data["CSA_EXTRA"][d_key] = {
+            "description": f"Controls related to {d_key}",
+            "csa_controls": group[CONTROL_FIELDS].to_dict('records')
+        }
+
+    return final_data, set(mapped['id']), set(extra['id'])
+
+# --- Pipeline ---
+
+def ingest(incremental=False, workers=None):
+    """
+    Rebuild the catalog from every framework source (see modules.sources).
+    incremental: reuse cached frames of unchanged sources and skip the run
+    entirely when no source changed since the last build.
+    workers: size of the parsing process pool (1 parses in-process).
+    """
+    print("Starting ingestion...")
+
+    source_list = []
+    for src in sources.get_default_sources(NIST_CSV, CSA_EXCEL):
+        if src.exists():
+            source_list.append(src)
+        elif src.required:
+            print(f"Error: {src.path} not found.")
+            return
+
+    hashes = {}
+    for src in source_list:
+        hashes.update(src.get_hashes())
+    previous = load_manifest()
+    if previous.get("cache_version") != sources.CACHE_VERSION:
+        previous = {}
+    prev_hashes = previous.get("sources", {})
+    source_status = {k: ("unchanged" if prev_hashes.get(k) == h else "changed") for k, h in hashes.items()}
+
+    outputs_exist = os.path.exists(BASE_OUTPUT_FILE) and os.path.exists(OVERLAY_OUTPUT_FILE)
+    if incremental and outputs_exist and prev_hashes == hashes:
+        print("Sources unchanged since the last build; catalog is up to date.")
+        write_diff({"added": [], "removed": [], "changed": {}}, source_status)
         return
 
+    timer = StageTimer()
+
+    # --- 1. Parse sources (one worker process per source) ---
     try:
-        # Load Mappings
-        map_df = pd.read_excel(CSA_EXCEL, sheet_name="Scope Applicability (Mappings)", header=2)
-        
-        # Load Controls Info
-        ctrl_df = pd.read_excel(CSA_EXCEL, sheet_name="AICM", header=2)
-
-        # Load Questions
-        q_df = pd.read_excel(CSA_EXCEL, sheet_name="AI-CAIQ", header=1)
-        
-        print("CSA Excel loaded.")
-        
+        with timer.stage("parse sources"):
+            results = parse_sources(source_list, hashes, incremental, workers)
     except Exception as e:
-        print(f"Error reading {CSA_EXCEL}: {e}")
+        print(f"Error parsing catalog sources: {e}")
         return
+    for src, res in zip(source_list, results):
+        timer.add_detail(src.name, res["elapsed"])
 
-    # Build Mapping Dictionary
-    csa_map = {}
-    for _, row in map_df.iterrows():
-        c_id = row.get('Control ID')
-        raw_map = row.get('Control Mapping.3')
-        if pd.notna(c_id) and pd.notna(raw_map):
-            nist_subcats = normalize_nist_mapping(str(raw_map))
-            if nist_subcats:
-                csa_map[c_id] = nist_subcats
-
-    print(f"Mapped {len(csa_map)} CSA controls to NIST.")
-
-    # Build Question Map
-    q_map = {}
-    for _, row in q_df.iterrows():
-        c_id = row.get('Control ID')
-        q_text = row.get('Consensus Assessments Question')
-        q_id = row.get('Question ID')
-        
-        if pd.notna(c_id) and pd.notna(q_text):
-            final_text = str(q_text).strip()
-            if pd.notna(q_id):
-                final_text = f"{q_id} {final_text}"
-            q_map[c_id] = final_text
-
-    # --- 3. Populate Controls ---
-    count_mapped = 0
-    count_extra = 0
-    
-    unique_ids_mapped = set()
-    unique_ids_extra = set()
-    
-    # Wave Counters
-    wave_counts = {1: 0, 2: 0, 3: 0}
-
-    for _, row in ctrl_df.iterrows():
-        c_id = row.get('Control ID')
-        spec = row.get('Control Specification')
-        domain = row.get('Control Domain')
-        
-        if pd.isna(c_id): continue
-        
-        # Determine Wave based on Heuristic
-        # Goal: Wave 1 (Basic), Wave 2 (Intermediate), Wave 3 (Advanced)
-        # Strategy: Mix of Domain keywords and specific priority domains.
-        
-        wave = 2 # Default to Intermediate
-        
-        dom_str = str(domain).upper() if pd.notna(domain) else ""
-        c_id_str = str(c_id).upper()
-        
-        # Parse numeric part of ID (e.g., AIS-01 -> 1)
-        try:
-            id_num = int(re.search(r'(\d+)', c_id_str.split('-')[-1]).group(1))
-        except:
-            id_num = 99
-            
-        # --- WAVE 1: FOUNDATION (Governance, Inventory, Basic Security) ---
-        # Include keywords related to policy, inventory, strategy, basic awareness
-        w1_keywords = ["GOVERNANCE", "INVENTORY", "STRATEGY", "POLICY", "LEGAL", "HUMAN", "DATA SECURITY"]
-        
-        if any(k in dom_str for k in w1_keywords):
-            wave = 1
-        elif id_num <= 3: # First few controls in any domain are likely foundational
-            wave = 1
-            
-        # --- WAVE 3: ADVANCED (Forensics, Audit, Specific Ops) ---
-        w3_keywords = ["FORENSIC", "INCIDENT", "AUDIT", "BUSINESS CONTINUITY", "INTEROPERABILITY"]
-        
-        if any(k in dom_str for k in w3_keywords):
-            if id_num > 2: # Keep very first incidents controls in Wave 1 or 2
-                wave = 3
-        
-        if id_num >= 10: # High numbering usually implies specific/advanced scenarios
-            wave = 3
-
-        wave_counts[wave] += 1
-        
-        question_text = q_map.get(c_id, str(spec)[:100])
-        
-        control_obj = {
-            "id": str(c_id),
-            "text": question_text,
-            "help": str(spec)[:300] + "..." if pd.notna(spec) and len(str(spec)) > 300 else str(spec),
-            "domain": str(domain),
-            "wave": wave
-        }
-        
-        targets = csa_map.get(c_id, [])
-        
-        if targets:
-            # Add to NIST Categories
-            mapped_any = False
-            for target in targets:
-                func = target.split()[0]
-                if func in final_data and target in final_data[func]:
-                    existing_ids = [c['id'] for c in final_data[func][target]['csa_controls']]
-                    if c_id not in existing_ids:
-                        final_data[func][target]['csa_controls'].append(control_obj)
-                        mapped_any = True
-            if mapped_any:
-                unique_ids_mapped.add(c_id)
-                count_mapped += 1
-        else:
-            # Add to CSA_EXTRA
-            d_key = str(domain) if pd.notna(domain) else "Uncategorized"
-            
-            if d_key not in final_data["CSA_EXTRA"]:
-                final_data["CSA_EXTRA"][d_key] = {
-                    "description": f"Controls related to {d_key}",
-                    "csa_controls": []
-                }
-            
-            existing_ids = [c['id'] for c in final_data["CSA_EXTRA"][d_key]['csa_controls']]
-            if c_id not in existing_ids:
-                final_data["CSA_EXTRA"][d_key]['csa_controls'].append(control_obj)
-                unique_ids_extra.add(c_id)
-                count_extra += 1
-            
+    # --- 2. Merge and populate controls ---
+    with timer.stage("merge sources"):
+        final_data, unique_ids_mapped, unique_ids_extra = merge_sources(source_list, results)
+
+    print(f"NIST Skeleton built. Categories found: {sum(len(v) for k, v in final_data.items() if k != 'CSA_EXTRA')}")
+    merged = [c for subcats in final_data.values() for v in subcats.values() for c in v['csa_controls']]
+    wave_counts = {w: len({c['id'] for c in merged if c['wave'] == w}) for w in (1, 2, 3)}
+    fw_counts = pd.Series([fw for c in {c['id']: c for c in merged}.values() for fw in c['frameworks']]).value_counts()
     print(f"Total Unique Mapped Controls: {len(unique_ids_mapped)}")
     print(f"Total Unique Extra Controls: {len(unique_ids_extra)}")
     print(f"Total Unique Controls in System: {len(unique_ids_mapped) + len(unique_ids_extra)}")
     print(f"Wave Distribution: {wave_counts}")
+    print(f"Framework Coverage: {fw_counts.to_dict()}")
+
+    # 3. Save JSON (base structure + English strings) and the diff against the previous build
+    with timer.stage("split catalog"):
+        base, overlay = catalog.split_catalog(final_data)
+    with timer.stage("diff + save json"):
+        write_diff(diff_catalogs(read_catalog_outputs(), (base, overlay)), source_status)
+        for out_file, payload in [(BASE_OUTPUT_FILE, base), (OVERLAY_OUTPUT_FILE, overlay)]:
+            # Atomic replace: running app workers hot-reload these files (see data.check_for_update)
+            with open(out_file + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=2, ensure_ascii=False)
+            os.replace(out_file + ".tmp", out_file)
+            print(f"Data saved to {out_file}")
 
-    # 4. Save JSON
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, indent=2)
-        
-    print(f"Data saved to {OUTPUT_FILE}")
+    # 4. Save binary snapshots (memory-mapped by modules.data at startup)
+    with timer.stage("snapshots"):
+        build_snapshots()
+    save_manifest(hashes)
+    timer.report()
+
+def get_catalog_languages():
+    """Languages with an overlay file next to the base catalog."""
+    prefix, suffix = data.CATALOG_OVERLAY_FILE.split("{lang}")
+    langs = []
+    for p in sorted(glob.glob(data.CATALOG_OVERLAY_FILE.format(lang="*"))):
+        lang = p[len(prefix):-len(suffix)]
+        if p != BASE_OUTPUT_FILE:
+            langs.append(lang)
+    return langs
+
+def build_snapshots():
+    """Compile each language's composed catalog into its binary snapshot (catalog_<lang>.snap)."""
+    for lang in get_catalog_languages():
+        catalog_sources = data.get_catalog_sources(lang)
+        if not catalog_sources:
+            continue
+        tree, raw = data.read_catalog_tree(catalog_sources)
+        snap_file = snapshot.snapshot_path(data.CATALOG_OVERLAY_FILE.format(lang=lang))
+        n_controls, n_subcats = snapshot.write_snapshot(tree, snap_file, source_bytes=raw)
+        print(f"Snapshot saved to {snap_file} ({n_controls} controls, {n_subcats} subcategories, {os.path.getsize(snap_file)} bytes)")
 
 if __name__ == "__main__":
-    ingest()
+    # --snapshot-only: rebuild snapshots from the existing JSON without re-reading the sources
+    # --incremental: re-parse only sources whose content hash changed since the last build
+    # --serial: parse sources in this process instead of a process pool
+    if "--snapshot-only" in sys.argv:
+        build_snapshots()
+    else:
+        ingest(incremental="--incremental" in sys.argv, workers=1 if "--serial" in sys.argv else None)
@@ -1,35 +1,67 @@
+import pandas as pd
 import modules.data as data
 
 # Framework Mappings Logic
 # Maps NIST AI RMF Categories to other standards.
 
-def get_control_info(control_id):
+def get_control_info(control_id, catalog=None):
     """
     Retrieve text/description for a specific control ID.
     Returns dict: {'text': ..., 'help': ...}
     """
-    for func, subcats in data.ASSESSMENT_DATA.items():
-        for subcat_key, content in subcats.items():
-            controls = content.get('csa_controls', [])
-            for c in controls:
-                if c['id'] == control_id:
-                    return {'text': c.get('text', ''), 'help': c.get('help', '')}
-    return {'text': 'Control text not found', 'help': ''}
-
-def get_subcat_from_id(control_id):
+    rec = data.get_control_index(catalog).get(control_id)
+    if rec is None:
+        return {'text': 'Control text not found', 'help': ''}
+    return {'text': rec['text'], 'help': rec['help']}
+
+def get_subcat_from_id(control_id, catalog=None):
     """
     Reverse lookup to find which NIST Subcategory a control belongs to.
     e.g. "A&A-01" -> "GOVERN 1.1"
+    Controls mapped to several subcategories return the first one (see get_subcats_from_id).
+    """
+    rec = data.get_control_index(catalog).get(control_id)
+    return rec['nist_subcats'][0] if rec else "Unmapped"
+
+def get_subcats_from_id(control_id, catalog=None):
+    """Every NIST Subcategory a control belongs to, in catalog order."""
+    rec = data.get_control_index(catalog).get(control_id)
+    return rec['nist_subcats'] if rec else ()
+
+# --- Bulk Lookups ---
+
+def enrich_controls(df, id_col='question_id', columns=None, catalog=None):
+    """
+    Adds control index fields (text, help, domain, wave, nist_function, nist_subcat,
+    nist_subcats) to every row of df in a single merge on id_col.
+    Unknown IDs get NaN; callers choose their own fallbacks with fillna.
+    """
+    index_df = data.get_control_index_frame(catalog)
+    if columns is not None:
+        index_df = index_df[['control_id'] + list(columns)]
+
+    merged = df.merge(index_df, how='left', left_on=id_col, right_on='control_id', suffixes=('', '_ctrl'))
+    if id_col != 'control_id':
+        merged = merged.drop(columns=['control_id'])
+    merged.index = df.index
+    return merged
+
+COMPLIANCE_KEYS = ['nist_600_1', 'iso_27001', 'eu_ai_act']
+
+def enrich_compliance(df, subcat_col='nist_subcat'):
+    """
+    Adds nist_600_1 / iso_27001 / eu_ai_act columns for each row's NIST subcategory.
+    The mapping is resolved once per distinct subcategory, then merged.
     """
-    # Iterate through loaded data
-    # This is efficient enough for ~100 controls
-    for func, subcats in data.ASSESSMENT_DATA.items():
-        for subcat_key, content in subcats.items():
-            controls = content.get('csa_controls', [])
-            for c in controls:
-                if c['id'] == control_id:
-                    return subcat_key
-    return "Unmapped"
+    subcats = df[subcat_col].dropna().unique()
+    map_df = pd.DataFrame(
+        [[sc] + [get_compliance_mapping(sc).get(k, '-') for k in COMPLIANCE_KEYS] for sc in subcats],
+        columns=[subcat_col] + COMPLIANCE_KEYS
+    )
+    merged = df.merge(map_df, how='left', on=subcat_col)
+    merged.index = df.index
+    merged[COMPLIANCE_KEYS] = merged[COMPLIANCE_KEYS].fillna('-')
+    return merged
 
 def get_compliance_mapping(nist_subcat_key):
     """
@@ -0,0 +1,303 @@
+import json
+import struct
+import zlib
+from collections.abc import MutableMapping
+import numpy as np
+
+# Session Response Store
+# One int8 score array (0-5, UNANSWERED = -1) per (scope, project_type), indexed by the
+# catalog's control position, plus a side table for AI results. A control listed under
+# several subcategories has one score. The store is also a mapping over the UI widget keys
+# score_{scope}_{project_type}_{subcat}_{control_id}, so dict-style consumers keep working.
+# Saved snapshots keep the store in compact form (dumps/loads, see storage.get_snapshot_store).
+
+SCORE_OPTIONS = ["Not Implemented (0)", "Initial (1)", "Defined (2)", "Managed (3)", "Measured (4)", "Optimized (5)"]
+UNANSWERED = -1
+MAX_SCORE = len(SCORE_OPTIONS) - 1
+KEY_PREFIX = "score_"
+
+# Maturity level -> the (response, evidence_ok) answer the scoring module rates.
+# One answer per level, rated strictly higher level by level, so answers map back to levels.
+SCORE_ANSWERS = (
+    ('Não', 'Não'),         # Not Implemented (0.0)
+    ('Parcial', 'Não'),     # Initial (0.35)
+    ('Parcial', 'Parcial'), # Defined (0.425)
+    ('Sim', 'Não'),         # Managed (0.7)
+    ('Sim', 'Parcial'),     # Measured (0.85)
+    ('Sim', 'Sim')          # Optimized (1.0)
+)
+_ANSWER_SCORES = {answer: score for score, answer in enumerate(SCORE_ANSWERS)}
+
+MAGIC = b"AIRS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBH")
+ARRAY_HEADER = struct.Struct("<I")
+
+def widget_key(scope, project_type, subcat_key, control_id):
+    return f"{KEY_PREFIX}{scope}_{project_type}_{subcat_key}_{control_id}"
+
+def parse_widget_key(key, control_pos):
+    """(scope, project_type, subcat, control_id) of a widget key, or None if it names no catalog control."""
+    if not isinstance(key, str) or not key.startswith(KEY_PREFIX):
+        return None
+    parts = key[len(KEY_PREFIX):].split("_", 2)
+    if len(parts) != 3:
+        return None
+    scope, project_type, rest = parts
+    # Subcategory keys may contain underscores; the control ID is the longest known suffix
+    for i, ch in enumerate(rest):
+        if ch == "_" and rest[i + 1:] in control_pos:
+            return scope, project_type, rest[:i], rest[i + 1:]
+    return None
+
+def answered(scores):
+    """
+    Whether a score (or each score of an array) is answered: any 0-5 level, Not Implemented
+    included. The one definition shared by progress counts and the scoring answers_map.
+    """
+    return np.asarray(scores) != UNANSWERED
+
+def score_answer(score):
+    """answers_map entry ({'response', 'evidence_ok'}) for a 0-5 maturity score; None when unanswered."""
+    if score is None or not answered(score):
+        return None
+    response, evidence_ok = SCORE_ANSWERS[max(0, min(5, int(score)))]
+    return {'response': response, 'evidence_ok': evidence_ok}
+
+def answer_score(answer):
+    """0-5 maturity score of an answers_map entry (inverse of score_answer); None for other answers."""
+    if not isinstance(answer, dict):
+        return None
+    return _ANSWER_SCORES.get((answer.get('response'), answer.get('evidence_ok')))
+
+def _pack_str(text):
+    raw = text.encode("utf-8")
+    return struct.pack("<H", len(raw)) + raw
+
+def _unpack_str(blob, offset):
+    (length,) = struct.unpack_from("<H", blob, offset)
+    offset += 2
+    return blob[offset:offset + length].decode("utf-8"), offset + length
+
+class ResponseStore(MutableMapping):
+
+    def __init__(self, catalog):
+        self.bind(catalog)
+        self._scores = {} # (scope, project_type) -> int8 array
+        self._ai = {}     # (scope, project_type) -> {control position: AI result dict}
+        self._listeners = {} # name -> callback(scope, project_type, control_id, score)
+
+    def bind(self, catalog):
+        self.version = catalog.version
+        self.control_ids = catalog.control_ids
+        self.control_pos = catalog.control_pos
+        self._subcats = {c_id: catalog.index[c_id]['nist_subcats'] for c_id in catalog.control_ids}
+
+    def rebind(self, catalog):
+        """Move the stored answers onto another catalog (e.g. after a hot reload), by control ID."""
+        if catalog.version == self.version and catalog.control_ids == self.control_ids:
+            return
+        old_ids = self.control_ids
+        self.bind(catalog)
+        for key, scores in self._scores.items():
+            fresh = np.full(len(self.control_ids), UNANSWERED, dtype=np.int8)
+            for pos in np.flatnonzero(answered(scores)).tolist():
+                new_pos = self.control_pos.get(old_ids[pos])
+                if new_pos is not None:
+                    fresh[new_pos] = scores[pos]
+            self._scores[key] = fresh
+        for key, table in self._ai.items():
+            self._ai[key] = {self.control_pos[old_ids[pos]]: res for pos, res in table.items()
+                             if old_ids[pos] in self.control_pos}
+
+    # --- Typed Access ---
+
+    def scores(self, scope, project_type):
+        """Score array of a (scope, project_type); UNANSWERED where no score was set."""
+        key = (scope, project_type)
+        arr = self._scores.get(key)
+        if arr is None:
+            arr = self._scores[key] = np.full(len(self.control_ids), UNANSWERED, dtype=np.int8)
+        return arr
+
+    def get_score(self, scope, project_type, control_id, default=0):
+        arr = self._scores.get((scope, project_type))
+        pos = self.control_pos.get(control_id)
+        if arr is None or pos is None or not answered(arr[pos]):
+            return default
+        return int(arr[pos])
+
+    def set_score(self, scope, project_type, control_id, score):
+        pos = self.control_pos.get(control_id)
+        if pos is None:
+            return
+        arr = self.scores(scope, project_type)
+        value = UNANSWERED if score is None else max(0, min(5, int(score)))
+        if arr[pos] != value:
+            arr[pos] = value
+            for callback in list(self._listeners.values()):
+                callback(scope, project_type, control_id, None if value == UNANSWERED else value)
+
+    def get_ai(self, scope, project_type, control_id):
+        pos = self.control_pos.get(control_id)
+        return self._ai.get((scope, project_type), {}).get(pos)
+
+    def set_ai(self, scope, project_type, control_id, result):
+        pos = self.control_pos.get(control_id)
+        if pos is not None:
+            self._ai.setdefault((scope, project_type), {})[pos] = result
+
+    def answers_map(self, scope, project_type):
+        """{control_id: {'response', 'evidence_ok'}} of the answered controls (see score_answer)."""
+        arr = self._scores.get((scope, project_type))
+        if arr is None:
+            return {}
+        return {self.control_ids[pos]: score_answer(arr[pos]) for pos in np.flatnonzero(answered(arr)).tolist()}
+
+    def merge(self, other):
+        """Copy another store's scores and AI results into this one by control ID (listeners are notified)."""
+        for (scope, project_type), arr in other._scores.items():
+            for pos in np.flatnonzero(answered(arr)).tolist():
+                self.set_score(scope, project_type, other.control_ids[pos], int(arr[pos]))
+        for (scope, project_type), table in other._ai.items():
+            for pos, res in table.items():
+                self.set_ai(scope, project_type, other.control_ids[pos], res)
+
+    def clear(self):
+        self._scores.clear()
+        self._ai.clear()
+        for callback in list(self._listeners.values()):
+            callback(None, None, None, None)
+
+    # --- Change Listeners ---
+
+    def listen(self, name, callback):
+        """
+        Register callback(scope, project_type, control_id, score) for every changed score
+        (score None = cleared). Re-registering a name replaces it; clear() calls it with all None.
+        """
+        self._listeners[name] = callback
+
+    # --- Widget Key Adapters ---
+
+    def _resolve(self, key):
+        parsed = parse_widget_key(key, self.control_pos)
+        if parsed is None:
+            raise KeyError(key)
+        return parsed
+
+    def __getitem__(self, key):
+        scope, project_type, _, control_id = self._resolve(key)
+        score = self.get_score(scope, project_type, control_id, default=None)
+        if score is None:
+            raise KeyError(key)
+        return score
+
+    def __setitem__(self, key, value):
+        scope, project_type, _, control_id = self._resolve(key)
+        self.set_score(scope, project_type, control_id, value)
+
+    def __delitem__(self, key):
+        scope, project_type, _, control_id = self._resolve(key)
+        self.set_score(scope, project_type, control_id, None)
+
+    def __iter__(self):
+        for (scope, project_type), arr in list(self._scores.items()):
+            for pos in np.flatnonzero(answered(arr)).tolist():
+                c_id = self.control_ids[pos]
+                for subcat in self._subcats[c_id]:
+                    yield widget_key(scope, project_type, subcat, c_id)
+
+    def __len__(self):
+        return sum(len(self._subcats[self.control_ids[pos]])
+                   for arr in self._scores.values()
+                   for pos in np.flatnonzero(answered(arr)).tolist())
+
+    def ai_by_widget_key(self):
+        """AI results keyed like the legacy st.session_state['ai_results'] dict."""
+        out = {}
+        for (scope, project_type), table in self._ai.items():
+            for pos, res in table.items():
+                c_id = self.control_ids[pos]
+                for subcat in self._subcats[c_id]:
+                    out[widget_key(scope, project_type, subcat, c_id)] = res
+        return out
+
+    @classmethod
+    def from_widget_dict(cls, catalog, responses=None, ai_results=None):
+        """Store built from legacy widget-key dicts; keys naming no catalog control are dropped."""
+        store = cls(catalog)
+        for key, value in (responses or {}).items():
+            if parse_widget_key(key, store.control_pos) is not None and isinstance(value, (int, float)):
+                store[key] = value
+        for key, res in (ai_results or {}).items():
+            parsed = parse_widget_key(key, store.control_pos)
+            if parsed is not None:
+                store.set_ai(parsed[0], parsed[1], parsed[3], res)
+        return store
+
+    # --- Serialization ---
+
+    def dumps(self, keys=None):
+        """
+        Compact bytes form of the scores (AI results are kept apart, see dump_ai): catalog
+        version, then one zlib-compressed int8 array per (scope, project_type) in keys (default all).
+        """
+        arrays = [(key, arr) for key, arr in self._scores.items() if keys is None or key in keys]
+        parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(arrays)), _pack_str(self.version or "")]
+        for (scope, project_type), arr in arrays:
+            packed = zlib.compress(arr.tobytes(), 9)
+            parts += [_pack_str(scope), _pack_str(project_type), ARRAY_HEADER.pack(len(packed)), packed]
+        return b"".join(parts)
+
+    def dump_ai(self, keys=None):
+        """AI side table as JSON: [scope, project_type, control_id, result] entries, by control ID."""
+        return json.dumps([
+            [scope, project_type, self.control_ids[pos], res]
+            for (scope, project_type), table in self._ai.items() if keys is None or (scope, project_type) in keys
+            for pos, res in table.items()
+        ], ensure_ascii=False, default=str)
+
+    @classmethod
+    def loads(cls, blob, catalog, ai=None):
+        """
+        Store from dumps() output (plus dump_ai() output, when given). The catalog must be the
+        version the scores were indexed by; ValueError otherwise or for a malformed blob.
+        """
+        try:
+            magic, version, n_arrays = HEADER.unpack_from(blob, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"Not a v{FORMAT_VERSION} response blob")
+            catalog_version, offset = _unpack_str(blob, HEADER.size)
+            if catalog_version != (catalog.version or ""):
+                raise ValueError(f"Responses were saved for catalog {catalog_version}, not {catalog.version}")
+            store = cls(catalog)
+            for _ in range(n_arrays):
+                scope, offset = _unpack_str(blob, offset)
+                project_type, offset = _unpack_str(blob, offset)
+                (length,) = ARRAY_HEADER.unpack_from(blob, offset)
+                offset += ARRAY_HEADER.size
+                arr = np.frombuffer(zlib.decompress(blob[offset:offset + length]), dtype=np.int8).copy()
+                offset += length
+                if len(arr) != len(store.control_ids):
+                    raise ValueError("Response array does not match the catalog size")
+                store._scores[(scope, project_type)] = arr
+        except (struct.error, zlib.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Malformed response blob: {e}") from e
+        for scope, project_type, control_id, res in json.loads(ai or "[]"):
+            store.set_ai(scope, project_type, control_id, res)
+        return store
+
+def get_session_store(state, catalog):
+    """
+    The session's ResponseStore (state['responses']), created on first use, converted from
+    a legacy widget-key dict (plus state['ai_results']) or moved onto a reloaded catalog.
+    """
+    store = state.get('responses')
+    if isinstance(store, ResponseStore):
+        store.rebind(catalog)
+    else:
+        store = ResponseStore.from_widget_dict(catalog, store, state.get('ai_results'))
+        state['responses'] = store
+        state.pop('ai_results', None)
+    return store
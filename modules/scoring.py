@@ -1,11 +1,13 @@
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Union, Any, Tuple
 from dataclasses import dataclass
 import math
 from datetime import datetime
+import heapq
+import numpy as np
 
 @dataclass
 class RoadmapItem:
-    priority: str # 'immediate', 'short', 'medium'
+    priority: str # 'immediate', 'short', 'medium', 'long'
     timeframe: str # '0-30 dias', etc.
     domain: str
     action: str
@@ -207,40 +209,483 @@ def calculate_domain_metrics(
         critical_gaps=total_critical_gaps
     )
 
-def generate_roadmap(domain_metrics: List[DomainMetrics], max_items: int = 10) -> List[RoadmapItem]:
+# --- Vectorized Kernel ---
+# Array form of calculate_domain_metrics for whole catalog selections.
+# Vectors are aligned to the catalog's control order (Catalog.control_ids); the
+# selected table rows are grouped into contiguous subcategory segments, and
+# subcategories into contiguous domain segments, so every total is a reduceat.
+# The per-question functions above stay as the reference implementation.
+
+RESPONSE_NA = -1.0 # Response vector value for 'NA' (answered, not applicable); NaN = unanswered
+CRITICAL_LEVELS = ('High', 'Critical')
+
+UNANSWERED = (math.nan, EVIDENCE_MULTIPLIERS['NA'])
+
+def encode_answer(answer: Any) -> Tuple[float, float]:
+    """(response, evidence) values of one answers_map entry (see encode_answers)."""
+    if not isinstance(answer, dict) or not answer.get('response'):
+        return UNANSWERED
+    resp = answer['response']
+    return (RESPONSE_NA if resp == 'NA' else RESPONSE_SCORES.get(resp, 0.0),
+            EVIDENCE_MULTIPLIERS.get(answer.get('evidence_ok', 'NA'), 0.7))
+
+def encode_answers(answers_map: Dict[str, Dict[str, Any]], control_pos: Dict[str, int], n_controls: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (response, evidence) vectors from an answers_map ({question_id: {'response', 'evidence_ok'}}).
+    response holds the RESPONSE_SCORES value, NaN when unanswered or RESPONSE_NA for 'NA';
+    evidence holds the EVIDENCE_MULTIPLIERS value.
+    """
+    response = np.full(n_controls, np.nan)
+    evidence = np.full(n_controls, EVIDENCE_MULTIPLIERS['NA'])
+    for q_id, answer in answers_map.items():
+        i = control_pos.get(q_id)
+        if i is not None:
+            response[i], evidence[i] = encode_answer(answer)
+    return response, evidence
+
+def segment_starts(sizes: np.ndarray) -> np.ndarray:
+    """First position of each segment, given the segment lengths."""
+    return np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64) if len(sizes) else np.zeros(0, np.int64)
+
+def score_subcategories(
+    control_idx: np.ndarray,  # Control position of every selected row
+    seg_starts: np.ndarray,   # First row of each subcategory segment
+    response: np.ndarray,
+    evidence: np.ndarray,
+    critical: np.ndarray      # Bool per subcategory: criticality in CRITICAL_LEVELS
+) -> Dict[str, np.ndarray]:
+    """Per-subcategory score, counts and critical gaps (see calculate_subcategory_metrics)."""
+    resp = response[control_idx]
+    answered = ~np.isnan(resp)
+    applicable = resp != RESPONSE_NA
+    scored = answered & applicable
+    effective = np.where(scored, resp * evidence[control_idx], 0.0)
+
+    total = np.add.reduceat(effective, seg_starts)
+    n_answered = np.add.reduceat(answered.astype(np.int64), seg_starts)
+    n_applicable = np.add.reduceat(applicable.astype(np.int64), seg_starts)
+    gaps = np.add.reduceat((scored & (effective < 0.5)).astype(np.int64), seg_starts) * critical
+
+    has_score = (n_applicable > 0) & (n_answered > 0)
+    safe_applicable = np.maximum(n_applicable, 1)
+    return {
+        'score': np.where(has_score, total / safe_applicable, 0.0),
+        'coverage': np.where(n_applicable > 0, n_answered / safe_applicable, 0.0),
+        'total': np.diff(np.append(seg_starts, len(control_idx))),
+        'answered': n_answered,
+        'applicable': n_applicable,
+        'gaps': gaps,
+        'has_score': has_score
+    }
+
+def calculate_domain_metrics_batch(
+    domains: List[Tuple[str, str, str]],  # (domain_id, domain_name, nist_function) per domain
+    domain_starts: np.ndarray,            # First subcategory of each domain
+    subcat_ids: List[str],
+    seg_starts: np.ndarray,
+    control_idx: np.ndarray,
+    response: np.ndarray,
+    evidence: np.ndarray,
+    criticality: List[str],
+    weights: np.ndarray
+) -> List[DomainMetrics]:
     """
-    Generates a prioritized action plan based on identified critical gaps.
+    Vectorized calculate_domain_metrics over every domain of a selection.
+    Subcategory names are their IDs, as in the adapter.
+    """
+    if not len(seg_starts):
+        return []
+    critical = np.array([c in CRITICAL_LEVELS for c in criticality], dtype=bool)
+    sub = score_subcategories(control_idx, seg_starts, response, evidence, critical)
+
+    used_weight = np.where(sub['has_score'], weights, 0.0)
+    weighted = np.add.reduceat(sub['score'] * used_weight, domain_starts)
+    weight_sum = np.add.reduceat(used_weight, domain_starts)
+    dom = {k: np.add.reduceat(sub[k], domain_starts) for k in ('total', 'answered', 'applicable', 'gaps')}
+    dom_score = np.where(weight_sum > 0, weighted / np.where(weight_sum > 0, weight_sum, 1.0), 0.0)
+    dom_coverage = np.where(dom['applicable'] > 0, dom['answered'] / np.maximum(dom['applicable'], 1), 0.0)
+
+    # Plain Python numbers in the dataclasses, as the reference produces
+    sub_cols = {k: v.tolist() for k, v in sub.items()}
+    weights_list = np.asarray(weights, dtype=float).tolist()
+    bounds = np.append(domain_starts, len(seg_starts)).tolist()
+
+    results = []
+    for d, (domain_id, domain_name, nist_function) in enumerate(domains):
+        subcat_metrics_list = [
+            SubcategoryMetrics(
+                subcat_id=subcat_ids[i],
+                subcat_name=subcat_ids[i],
+                domain_id=domain_id,
+                score=sub_cols['score'][i],
+                maturity_level=get_maturity_level(sub_cols['score'][i]),
+                total_questions=sub_cols['total'][i],
+                answered_questions=sub_cols['answered'][i],
+                applicable_questions=sub_cols['applicable'][i],
+                coverage=sub_cols['coverage'][i],
+                criticality=criticality[i],
+                weight=weights_list[i],
+                critical_gaps=sub_cols['gaps'][i]
+            )
+            for i in range(bounds[d], bounds[d + 1])
+        ]
+        score = float(dom_score[d])
+        results.append(DomainMetrics(
+            domain_id=domain_id,
+            domain_name=domain_name,
+            nist_function=nist_function,
+            score=score,
+            maturity_level=get_maturity_level(score),
+            total_questions=int(dom['total'][d]),
+            answered_questions=int(dom['answered'][d]),
+            applicable_questions=int(dom['applicable'][d]),
+            coverage=float(dom_coverage[d]),
+            subcategory_metrics=subcat_metrics_list,
+            critical_gaps=int(dom['gaps'][d])
+        ))
+    return results
+
+# --- Sensitivity ---
+
+# Target states a control can be raised to: (response, evidence_ok)
+SENSITIVITY_TARGETS = (('Parcial', 'Sim'), ('Sim', 'Sim'))
+
+def score_sensitivity(
+    domain_starts: np.ndarray,
+    seg_starts: np.ndarray,
+    control_idx: np.ndarray,
+    response: np.ndarray,
+    evidence: np.ndarray,
+    weights: np.ndarray,
+    target_scores: List[float]   # Effective score of each target (response x evidence)
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Overall-score delta of raising each unanswered or below-target control to each target,
+    in one pass over the selection. The overall score is the plain mean of the domain
+    scores (adapter.get_overall_metrics); each domain is the weighted mean of its
+    subcategories that have a score.
+    Returns (candidate control positions, deltas of shape (candidates, targets)); the delta
+    is 0 where a control already meets the target.
+    """
+    n_rows, n_sub, n_dom = len(control_idx), len(seg_starts), len(domain_starts)
+    targets = np.asarray(target_scores, dtype=np.float64)
+    if not n_rows:
+        return np.zeros(0, np.int64), np.zeros((0, len(targets)))
+    sub = score_subcategories(control_idx, seg_starts, response, evidence, np.zeros(n_sub, dtype=bool))
+    weights = np.asarray(weights, dtype=np.float64)
+
+    resp = response[control_idx]
+    answered = ~np.isnan(resp)
+    applicable = resp != RESPONSE_NA
+    effective = np.where(answered & applicable, resp * evidence[control_idx], 0.0)
+    # NA controls are out of scope; everything else can still be raised
+    candidate = applicable
+    rows = np.flatnonzero(candidate)
+
+    seg_of_row = np.repeat(np.arange(n_sub), sub['total'])[rows]
+    dom_of_sub = np.repeat(np.arange(n_dom), np.diff(np.append(domain_starts, n_sub)))
+    dom_of_row = dom_of_sub[seg_of_row]
+
+    used_weight = np.where(sub['has_score'], weights, 0.0)
+    dom_num = np.add.reduceat(sub['score'] * used_weight, domain_starts)
+    dom_weight = np.add.reduceat(used_weight, domain_starts)
+    dom_score = np.where(dom_weight > 0, dom_num / np.where(dom_weight > 0, dom_weight, 1.0), 0.0)
+
+    # Subcategory totals with each candidate row raised to every target
+    old_eff = effective[rows][:, None]
+    new_eff = np.maximum(old_eff, targets[None, :])
+    raised = ~answered[rows][:, None] | (new_eff > old_eff)
+    sub_total = np.add.reduceat(effective, seg_starts)[seg_of_row][:, None]
+    new_score = (sub_total - old_eff + new_eff) / sub['applicable'][seg_of_row][:, None]
+    w = weights[seg_of_row][:, None]
+    has = sub['has_score'][seg_of_row][:, None]
+    d_num = np.where(raised, w * (new_score - np.where(has, sub['score'][seg_of_row][:, None], 0.0)), 0.0)
+    d_weight = np.where(raised, w * ~has, 0.0)
+
+    # A control listed in several subcategories of one domain moves that domain once
+    cand_ids, cand_of_row = np.unique(control_idx[rows], return_inverse=True)
+    pair, pair_of_row = np.unique(cand_of_row * n_dom + dom_of_row, return_inverse=True)
+    pair_dom = pair % n_dom
+    deltas = np.zeros((len(cand_ids), len(targets)))
+    for t in range(len(targets)):
+        num = dom_num[pair_dom] + np.bincount(pair_of_row, weights=d_num[:, t], minlength=len(pair))
+        wsum = dom_weight[pair_dom] + np.bincount(pair_of_row, weights=d_weight[:, t], minlength=len(pair))
+        new_dom = np.where(wsum > 0, num / np.where(wsum > 0, wsum, 1.0), 0.0)
+        deltas[:, t] = np.bincount(pair // n_dom, weights=new_dom - dom_score[pair_dom], minlength=len(cand_ids)) / n_dom
+    return cand_ids, deltas
+
+# --- Incremental Scoring Model ---
+
+def _question_terms(resp: float, ev: float) -> Tuple[float, int, int, int]:
+    """(effective score, answered, applicable, low score) of one question."""
+    answered = not math.isnan(resp)
+    applicable = resp != RESPONSE_NA
+    if answered and applicable:
+        effective = resp * ev
+        return effective, 1, 1, int(effective < 0.5)
+    return 0.0, int(answered), int(applicable), 0
+
+class ScoringModel:
+    """
+    Running-sum form of calculate_domain_metrics_batch for one selection, held per session.
+    Subcategory sums (effective score, answered, applicable, critical gaps) and domain sums
+    (weighted score, weight, counts) are updated in place, so applying one answer only
+    touches the subcategories listing that control and their domains.
+    metrics() rebuilds DomainMetrics objects only for domains changed since the last call.
+    """
+
+    def __init__(self, domains, domain_starts, subcat_ids, seg_starts, control_idx, criticality, weights, control_pos):
+        self.domains = list(domains)
+        self.subcat_ids = list(subcat_ids)
+        self.criticality = list(criticality)
+        self.weights = [float(w) for w in weights]
+        self.control_pos = control_pos
+
+        n_sub = len(self.subcat_ids)
+        sizes = np.diff(np.append(seg_starts, len(control_idx))).astype(int).tolist() if n_sub else []
+        dom_bounds = np.append(domain_starts, n_sub).astype(int).tolist()
+        self._dom_bounds = dom_bounds
+        self._sub_domain = [d for d in range(len(self.domains)) for _ in range(dom_bounds[d], dom_bounds[d + 1])]
+        self._critical = [c in CRITICAL_LEVELS for c in self.criticality]
+
+        # Control position -> subcategories listing it (a control can sit in several)
+        self._control_subcats = {}
+        for s, start in enumerate(np.asarray(seg_starts, dtype=int).tolist()):
+            for ci in np.asarray(control_idx[start:start + sizes[s]]).tolist():
+                self._control_subcats.setdefault(ci, []).append(s)
+
+        # Everything starts unanswered: applicable, no score
+        self._answers = {}
+        self._sub_total = [0.0] * n_sub
+        self._sub_answered = [0] * n_sub
+        self._sub_applicable = list(sizes)
+        self._sub_low = [0] * n_sub
+        self._sub_size = list(sizes)
+
+        n_dom = len(self.domains)
+        self._dom_weighted = [0.0] * n_dom
+        self._dom_weight = [0.0] * n_dom
+        self._dom_answered = [0] * n_dom
+        self._dom_applicable = [sum(sizes[dom_bounds[d]:dom_bounds[d + 1]]) for d in range(n_dom)]
+        self._dom_gaps = [0] * n_dom
+        self._dom_total = list(self._dom_applicable)
+        self._metrics = [None] * n_dom
+
+    def _sub_contribution(self, s):
+        """(score, weighted score, weight) the subcategory adds to its domain."""
+        if self._sub_applicable[s] > 0 and self._sub_answered[s] > 0:
+            score = self._sub_total[s] / self._sub_applicable[s]
+            return score, score * self.weights[s], self.weights[s]
+        return 0.0, 0.0, 0.0
+
+    def set_answer(self, question_id, answer) -> bool:
+        """Apply one answers_map entry (None clears it). Returns True if any score changed."""
+        ci = self.control_pos.get(question_id)
+        if ci is None:
+            return False
+        new = encode_answer(answer)
+        old = self._answers.get(question_id, UNANSWERED)
+        if new == old or (math.isnan(new[0]) and math.isnan(old[0])):
+            return False
+        if math.isnan(new[0]):
+            self._answers.pop(question_id, None)
+        else:
+            self._answers[question_id] = new
+
+        o_eff, o_ans, o_app, o_low = _question_terms(*old)
+        n_eff, n_ans, n_app, n_low = _question_terms(*new)
+        for s in self._control_subcats.get(ci, ()):
+            d = self._sub_domain[s]
+            _, o_weighted, o_weight = self._sub_contribution(s)
+
+            self._sub_answered[s] += n_ans - o_ans
+            self._sub_applicable[s] += n_app - o_app
+            self._sub_low[s] += n_low - o_low
+            # Reset to an exact zero once nothing is scored, so sums do not drift
+            self._sub_total[s] = self._sub_total[s] + n_eff - o_eff if self._sub_answered[s] else 0.0
+            _, n_weighted, n_weight = self._sub_contribution(s)
+
+            self._dom_weight[d] += n_weight - o_weight
+            self._dom_weighted[d] = self._dom_weighted[d] + n_weighted - o_weighted if self._dom_weight[d] > 0 else 0.0
+            self._dom_answered[d] += n_ans - o_ans
+            self._dom_applicable[d] += n_app - o_app
+            if self._critical[s]:
+                self._dom_gaps[d] += n_low - o_low
+            self._metrics[d] = None
+        return True
+
+    def sync(self, answers_map: Dict[str, Dict[str, Any]]) -> int:
+        """Apply every answer that differs from the model's state; returns the number applied."""
+        changed = 0
+        for q_id, answer in answers_map.items():
+            if q_id in self.control_pos and encode_answer(answer) != self._answers.get(q_id, UNANSWERED):
+                changed += self.set_answer(q_id, answer)
+        for q_id in [q for q in self._answers if q not in answers_map]:
+            changed += self.set_answer(q_id, None)
+        return changed
+
+    def _build_domain(self, d) -> DomainMetrics:
+        domain_id, domain_name, nist_function = self.domains[d]
+        subcat_metrics_list = []
+        for s in range(self._dom_bounds[d], self._dom_bounds[d + 1]):
+            score, _, _ = self._sub_contribution(s)
+            applicable = self._sub_applicable[s]
+            subcat_metrics_list.append(SubcategoryMetrics(
+                subcat_id=self.subcat_ids[s],
+                subcat_name=self.subcat_ids[s],
+                domain_id=domain_id,
+                score=score,
+                maturity_level=get_maturity_level(score),
+                total_questions=self._sub_size[s],
+                answered_questions=self._sub_answered[s],
+                applicable_questions=applicable,
+                coverage=self._sub_answered[s] / applicable if applicable > 0 else 0.0,
+                criticality=self.criticality[s],
+                weight=self.weights[s],
+                critical_gaps=self._sub_low[s] if self._critical[s] else 0
+            ))
+
+        weight = self._dom_weight[d]
+        score = self._dom_weighted[d] / weight if weight > 0 else 0.0
+        applicable = self._dom_applicable[d]
+        return DomainMetrics(
+            domain_id=domain_id,
+            domain_name=domain_name,
+            nist_function=nist_function,
+            score=score,
+            maturity_level=get_maturity_level(score),
+            total_questions=self._dom_total[d],
+            answered_questions=self._dom_answered[d],
+            applicable_questions=applicable,
+            coverage=self._dom_answered[d] / applicable if applicable > 0 else 0.0,
+            subcategory_metrics=subcat_metrics_list,
+            critical_gaps=self._dom_gaps[d]
+        )
+
+    def metrics(self) -> List[DomainMetrics]:
+        for d, cached in enumerate(self._metrics):
+            if cached is None:
+                self._metrics[d] = self._build_domain(d)
+        return list(self._metrics)
+
+# --- Roadmap Optimizer ---
+# Gap subcategories are knapsack items: gain = score still missing x criticality weight,
+# effort = controls still to implement. The 30/60/90-day buckets are filled in order,
+# each with its own effort budget, from the best gain/effort candidates. The last bucket
+# has no budget and takes whatever is left, so gaps bigger than every budget still appear.
+
+ROADMAP_BUCKETS = (
+    # (priority, timeframe, effort budget in controls; None = no limit)
+    ('immediate', '0-30 dias', 8),
+    ('short', '30-60 dias', 12),
+    ('medium', '60-90 dias', 16),
+    ('long', '90+ dias', None)
+)
+CRITICALITY_GAIN = {'Critical': 4.0, 'High': 3.0, 'Medium': 2.0, 'Low': 1.0}
+ROADMAP_CANDIDATES = 256 # Top gain/effort items kept for the solver
+KNAPSACK_MAX_CELLS = 200000 # items x budget above which a bucket falls back to greedy
+
+def roadmap_gain_effort(sm: SubcategoryMetrics) -> Tuple[float, int]:
+    """Estimated score gain and effort (controls to implement) of closing a subcategory."""
+    missing = max(0.0, 1.0 - sm.score)
+    gain = missing * CRITICALITY_GAIN.get(sm.criticality, 2.0) * sm.weight
+    return gain, max(1, math.ceil(sm.applicable_questions * missing))
+
+def _knapsack(items, budget):
+    """Exact 0/1 knapsack over (gain, effort, key) items with an integer budget; returns chosen positions."""
+    best = [0.0] * (budget + 1)
+    taken = []
+    for gain, effort, _ in items:
+        row = bytearray(budget + 1)
+        for b in range(budget, effort - 1, -1):
+            if best[b - effort] + gain > best[b]:
+                best[b] = best[b - effort] + gain
+                row[b] = 1
+        taken.append(row)
+    chosen, b = [], budget
+    for i in range(len(items) - 1, -1, -1):
+        if taken[i][b]:
+            chosen.append(i)
+            b -= items[i][1]
+    return chosen
+
+def _greedy(items, budget):
+    """Greedy gain/effort fill (items arrive ratio-sorted), or the best single item if that is worth more."""
+    chosen, used, total = [], 0, 0.0
+    for i, (gain, effort, _) in enumerate(items):
+        if used + effort <= budget:
+            chosen.append(i)
+            used += effort
+            total += gain
+    fitting = [i for i, item in enumerate(items) if item[1] <= budget]
+    single = max(fitting, key=lambda i: items[i][0], default=None)
+    if single is not None and items[single][0] > total:
+        return [single]
+    return chosen
+
+def optimize_roadmap(items, buckets=ROADMAP_BUCKETS, max_items=None) -> List[List[Any]]:
+    """
+    Assigns (gain, effort, key) items to buckets, each solved as a knapsack under its
+    effort budget; items left over roll into the next bucket. A bucket with budget None
+    takes every item not placed yet, best gain/effort first. Returns the keys per bucket.
+    Budgeted buckets only consider the ROADMAP_CANDIDATES best ratios (heap top-k).
+    """
+    ratio = lambda it: it[0] / it[1]
+    positive = [it for it in items if it[0] > 0]
+    remaining = heapq.nlargest(ROADMAP_CANDIDATES, positive, key=ratio)
+    plan = []
+    left = max_items if max_items is not None else len(positive)
+    for _, _, budget in buckets:
+        if budget is None:
+            placed = {key for keys in plan for key in keys}
+            rest = sorted((it for it in positive if it[2] not in placed), key=ratio, reverse=True)
+            plan.append([it[2] for it in rest[:max(left, 0)]])
+            left -= len(plan[-1])
+            remaining = []
+            continue
+        if left <= 0 or not remaining:
+            plan.append([])
+            continue
+        solve = _knapsack if len(remaining) * budget <= KNAPSACK_MAX_CELLS else _greedy
+        chosen = sorted(solve(remaining, budget))[:left]
+        plan.append([remaining[i][2] for i in chosen])
+        chosen_set = set(chosen)
+        remaining = [it for i, it in enumerate(remaining) if i not in chosen_set]
+        left -= len(chosen)
+    return plan
+
+def generate_roadmap(domain_metrics: List[DomainMetrics], max_items: int = 10, buckets=ROADMAP_BUCKETS) -> List[RoadmapItem]:
+    """
+    Generates an action plan from the identified critical gaps: the best gain per effort
+    set of subcategories for each 30/60/90-day bucket, then the remaining gaps in the
+    90+ day bucket (see optimize_roadmap).
     """
     gaps = []
     for dm in domain_metrics:
         for sm in dm.subcategory_metrics:
             if sm.critical_gaps > 0 or sm.score < 0.5:
                 gaps.append(sm)
-    
-    # Sort by criticality (High/Critical first) then score (Lowest first)
-    crit_map = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
-    gaps.sort(key=lambda x: (crit_map.get(x.criticality, 2), x.score))
-    
+
+    items = [(*roadmap_gain_effort(sm), i) for i, sm in enumerate(gaps)]
+    plan = optimize_roadmap(items, buckets, max_items)
+
     roadmap = []
-    for sm in gaps[:max_items]:
-        priority = 'immediate' if sm.criticality in ['High', 'Critical'] and sm.score < 0.3 else \
-                   ('short' if sm.criticality in ['High', 'Critical'] or sm.score < 0.5 else 'medium')
-        
-        timeframe = '0-30 dias' if priority == 'immediate' else \
-                    ('30-60 dias' if priority == 'short' else '60-90 dias')
-        
-        impact = 'Alto impacto em risco' if sm.criticality in ['High', 'Critical'] else 'Médio impacto em risco'
-        effort = 'high' if sm.score < 0.2 else ('medium' if sm.score < 0.5 else 'low')
-        
-        roadmap.append(RoadmapItem(
-            priority=priority,
-            timeframe=timeframe,
-            domain=sm.domain_name if hasattr(sm, 'domain_name') else sm.domain_id,
-            action=f"Implementar controle: {sm.subcat_name}",
-            impact=impact,
-            effort=effort,
-            question_id=sm.subcat_id, # Simplified to subcat for action
-            subcat_id=sm.subcat_id
-        ))
-        
+    for (priority, timeframe, _), chosen in zip(buckets, plan):
+        for i in chosen:
+            sm = gaps[i]
+            _, effort_units = roadmap_gain_effort(sm)
+            impact = 'Alto impacto em risco' if sm.criticality in ['High', 'Critical'] else 'Médio impacto em risco'
+            effort = 'low' if effort_units <= 2 else ('medium' if effort_units <= 5 else 'high')
+
+            roadmap.append(RoadmapItem(
+                priority=priority,
+                timeframe=timeframe,
+                domain=sm.domain_name if hasattr(sm, 'domain_name') else sm.domain_id,
+                action=f"Implementar controle: {sm.subcat_name}",
+                impact=impact,
+                effort=effort,
+                question_id=sm.subcat_id, # Simplified to subcat for action
+                subcat_id=sm.subcat_id
+            ))
+
     return roadmap
@@ -0,0 +1,209 @@
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Mapping
+
+# Binary Catalog Snapshot
+# A compact, memory-mapped form of one language's composed catalog, produced by ingest.py.
+#
+# Layout (little-endian):
+#   header        MAGIC, format version, source crc32/size, table counts, heap offset/size
+#   controls      fixed-width rows: (off, len) for id/text/help/domain/frameworks + wave
+#   subcategories fixed-width rows: (off, len) for function/key/description + member range
+#   members       one u32 control row index per (subcategory, control) pair
+#   string heap   deduplicated UTF-8 strings
+#
+# Strings are only decoded when a field is read, so the heap (mostly NIST
+# descriptions) stays in the shared page cache instead of each worker's heap.
+
+MAGIC = b"AICMSNAP"
+FORMAT_VERSION = 2
+SNAPSHOT_EXT = ".snap"
+
+HEADER = struct.Struct("<8sIIIIIIQQ")
+CONTROL_ROW = struct.Struct("<IIIIIIIIIIB3x")
+SUBCAT_ROW = struct.Struct("<IIIIIIII")
+MEMBER_ROW = struct.Struct("<I")
+
+CONTROL_FIELDS = ('id', 'text', 'help', 'domain')
+# A control's framework tags are stored as one heap string
+FRAMEWORK_SEP = "\x1f"
+
+def snapshot_path(json_path):
+    """catalog_en.json -> catalog_en.snap"""
+    return os.path.splitext(json_path)[0] + SNAPSHOT_EXT
+
+def source_fingerprint(raw_bytes):
+    # Line endings are normalized so a CRLF checkout does not invalidate the snapshot
+    raw_bytes = raw_bytes.replace(b"\r\n", b"\n")
+    return zlib.crc32(raw_bytes) & 0xFFFFFFFF, len(raw_bytes)
+
+# --- Writer ---
+
+class _StringHeap:
+    def __init__(self):
+        self.buf = bytearray()
+        self.offsets = {}
+
+    def add(self, text):
+        text = "" if text is None else str(text)
+        if text not in self.offsets:
+            encoded = text.encode("utf-8")
+            self.offsets[text] = (len(self.buf), len(encoded))
+            self.buf.extend(encoded)
+        return self.offsets[text]
+
+def write_snapshot(catalog_data, path, source_bytes=b""):
+    """
+    Serialize a catalog tree ({func: {subcat: {description, csa_controls}}}) to path.
+    source_bytes is the concatenated JSON the tree was composed from; its
+    fingerprint lets the loader detect a stale snapshot.
+    """
+    heap = _StringHeap()
+    control_rows = []
+    control_pos = {}
+    subcat_rows = []
+    members = []
+
+    for func, subcats in catalog_data.items():
+        for subcat_key, subcat_val in subcats.items():
+            first_member = len(members)
+            for c in subcat_val.get('csa_controls', []):
+                c_id = str(c['id'])
+                if c_id not in control_pos:
+                    control_pos[c_id] = len(control_rows)
+                    fields = []
+                    for name in CONTROL_FIELDS:
+                        fields.extend(heap.add(c.get(name, '')))
+                    fields.extend(heap.add(FRAMEWORK_SEP.join(c.get('frameworks', ()))))
+                    control_rows.append(CONTROL_ROW.pack(*fields, int(c.get('wave', 2))))
+                members.append(MEMBER_ROW.pack(control_pos[c_id]))
+
+            subcat_rows.append(SUBCAT_ROW.pack(
+                *heap.add(func),
+                *heap.add(subcat_key),
+                *heap.add(subcat_val.get('description', '')),
+                first_member,
+                len(members) - first_member
+            ))
+
+    crc, size = source_fingerprint(source_bytes)
+    tables = b"".join(control_rows) + b"".join(subcat_rows) + b"".join(members)
+    heap_offset = HEADER.size + len(tables)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, crc, size,
+                         len(control_rows), len(subcat_rows), len(members),
+                         heap_offset, len(heap.buf))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(tables)
+        f.write(heap.buf)
+
+    # Atomic replace so running workers never map a half-written file
+    os.replace(tmp_path, path)
+    return len(control_rows), len(subcat_rows)
+
+# --- Reader ---
+
+class LazyRecord(Mapping):
+    """Read-only mapping whose string fields are decoded from the heap on access."""
+    __slots__ = ('_snap', '_spans', '_values')
+
+    def __init__(self, snap, spans, values):
+        self._snap = snap
+        self._spans = spans   # field -> (offset, length) in the string heap
+        self._values = values # already-decoded / non-string fields
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        off, length = self._spans[key]
+        return self._snap.string(off, length)
+
+    def __iter__(self):
+        yield from self._spans
+        yield from self._values
+
+    def __len__(self):
+        return len(self._spans) + len(self._values)
+
+    def __repr__(self):
+        return f"LazyRecord({dict(self)!r})"
+
+    def without(self, *keys):
+        """Same record minus keys, still lazy (used for the catalog's light views)."""
+        return LazyRecord(self._snap,
+                          {k: v for k, v in self._spans.items() if k not in keys},
+                          {k: v for k, v in self._values.items() if k not in keys})
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.source_crc, self.source_size,
+         self.n_controls, self.n_subcats, self.n_members,
+         self._heap_offset, self._heap_size) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a v{FORMAT_VERSION} catalog snapshot")
+
+        self._controls_offset = HEADER.size
+        self._subcats_offset = self._controls_offset + self.n_controls * CONTROL_ROW.size
+        self._members_offset = self._subcats_offset + self.n_subcats * SUBCAT_ROW.size
+        self._control_cache = {}
+
+    def matches_source(self, raw_bytes):
+        return (self.source_crc, self.source_size) == source_fingerprint(raw_bytes)
+
+    def string(self, offset, length):
+        start = self._heap_offset + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def control(self, row):
+        rec = self._control_cache.get(row)
+        if rec is None:
+            vals = CONTROL_ROW.unpack_from(self._mm, self._controls_offset + row * CONTROL_ROW.size)
+            spans = {name: (vals[2 * i], vals[2 * i + 1]) for i, name in enumerate(CONTROL_FIELDS)}
+            frameworks = self.string(vals[8], vals[9])
+            # IDs and framework tags are needed on every lookup; decode them up front
+            rec = LazyRecord(self, {k: v for k, v in spans.items() if k != 'id'},
+                             {'id': self.string(*spans['id']), 'wave': vals[10],
+                              'frameworks': tuple(frameworks.split(FRAMEWORK_SEP)) if frameworks else ()})
+            self._control_cache[row] = rec
+        return rec
+
+    def to_catalog(self):
+        """Rebuild the {func: {subcat: record}} tree; descriptions and texts stay lazy."""
+        tree = {}
+        for i in range(self.n_subcats):
+            (func_off, func_len, key_off, key_len, desc_off, desc_len,
+             first_member, n_members) = SUBCAT_ROW.unpack_from(self._mm, self._subcats_offset + i * SUBCAT_ROW.size)
+            rows = struct.unpack_from(f"<{n_members}I", self._mm, self._members_offset + first_member * MEMBER_ROW.size)
+            subcat = LazyRecord(self, {'description': (desc_off, desc_len)},
+                                {'csa_controls': [self.control(r) for r in rows]})
+            tree.setdefault(self.string(func_off, func_len), {})[self.string(key_off, key_len)] = subcat
+        return tree
+
+def load_snapshot(snap_path, source_paths):
+    """
+    Returns the catalog tree stored in snap_path, or None when the snapshot is
+    missing, unreadable or was built from different source JSON contents.
+    """
+    if not os.path.exists(snap_path):
+        return None
+    try:
+        snap = Snapshot(snap_path)
+        raw_parts = []
+        for p in source_paths:
+            with open(p, "rb") as f:
+                raw_parts.append(f.read())
+        if not snap.matches_source(b"".join(raw_parts)):
+            print(f"Snapshot {snap_path} is stale; falling back to JSON")
+            return None
+        return snap.to_catalog()
+    except Exception as e:
+        print(f"Error loading snapshot {snap_path}: {e}")
+        return None
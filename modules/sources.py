@@ -0,0 +1,390 @@
+import pandas as pd
+import re
+import os
+import glob
+import time
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+
+# Framework Catalog Sources
+# Each framework catalog is parsed by its own CatalogSource. Sources are parsed
+# independently (in worker processes by ingest.py) and return plain frames:
+#   skeleton  {func: {subcat: {description, csa_controls}}} or None
+#   controls  one row per control: CONTROL_COLUMNS
+#   targets   (id, target) rows mapping controls to NIST subcategories
+# ingest.merge_sources() dedupes controls by ID across sources.
+
+# Parsed source frames are pickled per content hash for incremental builds
+CACHE_DIR = ".ingest_cache"
+# Bump when the way a source is read changes, so old cached frames are not reused
+CACHE_VERSION = 1
+
+# Directory scanned for additional framework catalogs (one CSV per framework)
+FRAMEWORK_DIR = "frameworks"
+
+CONTROL_COLUMNS = ['id', 'text', 'help', 'domain', 'wave', 'extra_key', 'framework']
+
+XLSX_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XLSX_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+def normalize_nist_mapping(mapping_str):
+    """
+    Convert 'GV-1.1-001', 'GOVERN 1.1', 'MP-1.2' to 'GOVERN 1.1', 'MAP 1.2' etc.
+    Returns a list of valid NIST Subcategories found.
+    """
+    if not isinstance(mapping_str, str):
+        return []
+
+    mappings = []
+    
+    # Split by newlines or commas
+    tokens = re.split(r'[\n,]', mapping_str)
+    
+    for token in tokens:
+        token = token.strip().upper()
+        if not token:
+            continue
+            
+        # Detect Function
+        func = None
+        if "GV" in token or "GOVERN" in token: func = "GOVERN"
+        elif "MP" in token or "MAP" in token: func = "MAP"
+        elif "MS" in token or "MEASURE" in token: func = "MEASURE"
+        elif "MG" in token or "MANAGE" in token: func = "MANAGE"
+        
+        if func:
+            # Extract Number X.Y
+            # Regex to find X.Y (e.g., 1.1, 2.3)
+            match = re.search(r'(\d+\.\d+)', token)
+            if match:
+                number = match.group(1)
+                mappings.append(f"{func} {number}")
+                
+    return list(set(mappings))
+
+# Token -> NIST function, first match wins (same precedence as normalize_nist_mapping)
+NIST_FUNCTION_PATTERNS = [
+    ("GOVERN", "GV|GOVERN"),
+    ("MAP", "MP|MAP"),
+    ("MEASURE", "MS|MEASURE"),
+    ("MANAGE", "MG|MANAGE"),
+]
+
+# Wave heuristic keywords (matched against the upper-cased control domain)
+# Wave 1: foundation (governance, inventory, basic security)
+W1_KEYWORDS = ["GOVERNANCE", "INVENTORY", "STRATEGY", "POLICY", "LEGAL", "HUMAN", "DATA SECURITY"]
+# Wave 3: advanced (forensics, audit, specific ops)
+W3_KEYWORDS = ["FORENSIC", "INCIDENT", "AUDIT", "BUSINESS CONTINUITY", "INTEROPERABILITY"]
+
+# --- Source Hashing & Frame Cache ---
+
+def hash_bytes(*parts):
+    h = hashlib.sha256(str(CACHE_VERSION).encode())
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hash_bytes(f.read())
+
+def hash_workbook_sheets(path, sheet_names):
+    """
+    Content hash per sheet, taken from the raw xlsx zip members without parsing cells.
+    Shared strings are workbook-wide, so each sheet hashes only the strings it references.
+    Falls back to the whole-file hash if the workbook layout is unexpected.
+    """
+    try:
+        with zipfile.ZipFile(path) as zf:
+            workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+            rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+            targets = {r.get("Id"): r.get("Target") for r in rels}
+            shared = []
+            if "xl/sharedStrings.xml" in zf.namelist():
+                shared = re.findall(rb'<si>.*?</si>|<si/>', zf.read("xl/sharedStrings.xml"), re.S)
+
+            hashes = {}
+            for sheet in workbook.iter(f"{{{XLSX_NS}}}sheet"):
+                name = sheet.get("name")
+                if name not in sheet_names:
+                    continue
+                target = targets[sheet.get(f"{{{XLSX_REL_NS}}}id")]
+                member = target.lstrip("/") if target.startswith("/") else "xl/" + target
+                xml = zf.read(member)
+                refs = re.findall(rb'<c [^>]*t="s"[^>]*>\s*<v>(\d+)</v>', xml)
+                hashes[name] = hash_bytes(xml, *(shared[int(i)] for i in refs))
+            if set(hashes) == set(sheet_names):
+                return hashes
+            print(f"Warning: sheets missing from {path}; hashing the whole workbook")
+    except (zipfile.BadZipFile, KeyError, IndexError, ET.ParseError) as e:
+        print(f"Warning: could not hash sheets of {path} ({e}); hashing the whole workbook")
+
+    digest = hash_file(path)
+    return {name: digest for name in sheet_names}
+
+def load_frame(key, digest, loader, use_cache):
+    """
+    Returns (frame, rebuilt). The parsed frame is pickled under its content hash;
+    with use_cache an unchanged source is read back from the pickle instead of re-parsed.
+    """
+    cache_file = os.path.join(CACHE_DIR, f"{key}-{digest[:16]}.pkl")
+    if use_cache and os.path.exists(cache_file):
+        try:
+            return pd.read_pickle(cache_file), False
+        except Exception as e:
+            print(f"Warning: discarding cached frame {cache_file}: {e}")
+
+    df = loader()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(CACHE_DIR, f"{key}-*.pkl")):
+        os.remove(stale)
+    df.to_pickle(cache_file)
+    return df, True
+
+# --- Parsing Stages ---
+# Each stage works on whole columns; no per-row Python loops over the sheets.
+
+def build_nist_skeleton(nist_df):
+    """{func: {subcat: {description, csa_controls: []}}} from the NIST playbook columns."""
+    final_data = {
+        "GOVERN": {},
+        "MAP": {},
+        "MEASURE": {},
+        "MANAGE": {},
+        "CSA_EXTRA": {}
+    }
+
+    # Descriptions live in the 'section_about' row
+    about_rows = np.flatnonzero(nist_df.iloc[:, 0].map(str).to_numpy() == "section_about")
+    about = nist_df.iloc[about_rows[0]] if len(about_rows) else None
+
+    for col in nist_df.columns:
+        col_upper = str(col).upper()
+        if re.match(r'^(GOVERN|MAP|MEASURE|MANAGE)\s+\d+\.\d+$', col_upper):
+            desc = ""
+            if about is not None:
+                desc = str(about[col])
+                if desc == "nan": desc = ""
+            final_data[col_upper.split()[0]][col_upper] = {
+                "description": desc.replace('"', '').strip(),
+                "csa_controls": []
+            }
+    return final_data
+
+def explode_nist_targets(map_df, id_col, mapping_col):
+    """
+    Explode a free-text mapping column ('GV-1.1-001, MAP 1.2', ...) into one
+    (id, target) row per normalized NIST subcategory (same rules as
+    normalize_nist_mapping). The last mapping row of a control wins.
+    """
+    df = map_df[[id_col, mapping_col]].dropna()
+    df = pd.DataFrame({
+        'id': df[id_col].map(str).to_numpy(),
+        'row': np.arange(len(df)),
+        'token': df[mapping_col].map(str).str.split(r'[\n,]', regex=True).to_numpy()
+    }).explode('token')
+
+    tokens = df['token'].map(str).str.strip().str.upper()
+    func = pd.Series(np.select(
+        [tokens.str.contains(pat, regex=True) for _, pat in NIST_FUNCTION_PATTERNS],
+        [name for name, _ in NIST_FUNCTION_PATTERNS],
+        default=""
+    ), index=tokens.index)
+    number = tokens.str.extract(r'(\d+\.\d+)', expand=False)
+
+    df = df.assign(target=func + " " + number)[(func != "") & number.notna()]
+    df = df.drop_duplicates(['row', 'target'])
+    df = df[df['row'] == df.groupby('id', sort=False)['row'].transform('max')]
+    return df[['id', 'target']].reset_index(drop=True)
+
+def build_question_map(q_df):
+    """Series control_id -> question text ('<question id> <question>'); last row wins."""
+    df = q_df[['Control ID', 'Consensus Assessments Question', 'Question ID']]
+    df = df[df['Control ID'].notna() & df['Consensus Assessments Question'].notna()]
+    text = df['Consensus Assessments Question'].map(str).str.strip()
+    q_id = df['Question ID']
+    text = text.where(q_id.isna(), q_id.map(str) + " " + text)
+    return pd.Series(text.to_numpy(), index=df['Control ID'].to_numpy()).groupby(level=0, sort=False).last()
+
+def assign_waves(control_ids, domains):
+    """
+    Wave heuristic: 1 (foundation), 2 (intermediate, default), 3 (advanced),
+    from domain keywords and the numeric part of the control ID (AIS-01 -> 1).
+    """
+    dom = domains.where(domains.notna(), "").map(str).str.upper()
+    id_num = pd.to_numeric(
+        control_ids.map(str).str.upper().str.split('-').str[-1].str.extract(r'(\d+)', expand=False),
+        errors='coerce'
+    ).fillna(99).to_numpy()
+
+    w1 = dom.str.contains("|".join(map(re.escape, W1_KEYWORDS)), regex=True).to_numpy()
+    w3 = dom.str.contains("|".join(map(re.escape, W3_KEYWORDS)), regex=True).to_numpy()
+
+    wave = np.where(w1 | (id_num <= 3), 1, 2)
+    # Keep the very first incident controls in Wave 1 or 2
+    wave = np.where(w3 & (id_num > 2), 3, wave)
+    # High numbering usually implies specific/advanced scenarios
+    wave = np.where(id_num >= 10, 3, wave)
+    return wave
+
+def build_controls(ctrl_df, q_map, framework):
+    """One control record per AICM row, in sheet order."""
+    df = ctrl_df[ctrl_df['Control ID'].notna()]
+    c_id = df['Control ID']
+    spec = df['Control Specification']
+    domain = df['Control Domain']
+
+    spec_str = spec.map(str)
+    long_spec = spec.notna() & (spec_str.str.len() > 300)
+    text = c_id.map(q_map)
+
+    return pd.DataFrame({
+        'id': c_id.map(str).to_numpy(),
+        'text': text.where(text.notna(), spec_str.str[:100]).to_numpy(),
+        'help': spec_str.where(~long_spec, spec_str.str[:300] + "...").to_numpy(),
+        'domain': domain.map(str).to_numpy(),
+        'wave': assign_waves(c_id, domain),
+        'extra_key': domain.map(str).where(domain.notna(), "Uncategorized").to_numpy(),
+        'framework': framework
+    })
+
+# --- Source Adapters ---
+
+def empty_controls():
+    return pd.DataFrame({col: pd.Series(dtype=object) for col in CONTROL_COLUMNS})
+
+def empty_targets():
+    return pd.DataFrame({'id': pd.Series(dtype=object), 'target': pd.Series(dtype=object)})
+
+class CatalogSource:
+    """
+    Base class for a framework catalog. Subclasses hash their inputs and parse them
+    into frames; parse() runs in a worker process, so instances must be picklable.
+    """
+    framework = ""
+    required = False # A missing required source aborts the ingest
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def name(self):
+        return self.framework or os.path.basename(self.path)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def get_hashes(self):
+        """{cache key: content hash} of every input this source reads."""
+        raise NotImplementedError
+
+    def parse(self, hashes, use_cache):
+        """Returns {'skeleton', 'controls', 'targets'} (see module header)."""
+        raise NotImplementedError
+
+class NistPlaybookSource(CatalogSource):
+    """NIST AI RMF playbook CSV: provides the function/subcategory skeleton."""
+    framework = "NIST AI RMF"
+    required = True
+
+    def get_hashes(self):
+        return {"nist": hash_file(self.path)}
+
+    def parse(self, hashes, use_cache):
+        nist_df, rebuilt = load_frame("nist", hashes["nist"], lambda: pd.read_csv(self.path), use_cache)
+        print("NIST CSV loaded." if rebuilt else "NIST CSV unchanged (cached).")
+        return {"skeleton": build_nist_skeleton(nist_df), "controls": empty_controls(), "targets": empty_targets()}
+
+class CsaAicmSource(CatalogSource):
+    """CSA AI Controls Matrix workbook: controls, questions and their NIST mappings."""
+    framework = "CSA AI Security"
+    required = True
+
+    # Workbook sheets read by the parser: cache key -> (sheet name, header row)
+    SHEETS = {
+        "csa_mappings": ("Scope Applicability (Mappings)", 2),
+        "csa_controls": ("AICM", 2),
+        "csa_questions": ("AI-CAIQ", 1),
+    }
+
+    def get_hashes(self):
+        sheet_hashes = hash_workbook_sheets(self.path, [sheet for sheet, _ in self.SHEETS.values()])
+        return {key: sheet_hashes[sheet] for key, (sheet, _) in self.SHEETS.items()}
+
+    def parse(self, hashes, use_cache):
+        # Only sheets whose contents changed are re-parsed
+        frames = {}
+        for key, (sheet, header) in self.SHEETS.items():
+            loader = lambda sheet=sheet, header=header: pd.read_excel(self.path, sheet_name=sheet, header=header)
+            frames[key], rebuilt = load_frame(key, hashes[key], loader, use_cache)
+            print(f"CSA sheet '{sheet}' {'loaded' if rebuilt else 'unchanged (cached)'}.")
+
+        targets = explode_nist_targets(frames["csa_mappings"], 'Control ID', 'Control Mapping.3')
+        print(f"Mapped {targets['id'].nunique()} CSA controls to NIST.")
+        q_map = build_question_map(frames["csa_questions"])
+        controls = build_controls(frames["csa_controls"], q_map, self.framework)
+        return {"skeleton": None, "controls": controls, "targets": targets}
+
+class ControlListSource(CatalogSource):
+    """
+    Generic framework catalog as CSV (frameworks/<name>.csv). Columns:
+      Control ID (required), Control Text, Control Help, Control Domain, Wave,
+      NIST Mapping ('GV-1.1, MAP 2.3', same format as the CSA mapping sheet), Framework.
+    The framework tag defaults to the file name (OWASP_LLM.csv -> 'OWASP LLM');
+    a Framework column overrides it per row. A row whose ID already exists in an
+    earlier source only contributes its framework tag and NIST mappings.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.key = "framework_" + os.path.splitext(os.path.basename(path))[0]
+        self.framework = os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+
+    def get_hashes(self):
+        return {self.key: hash_file(self.path)}
+
+    def parse(self, hashes, use_cache):
+        df, rebuilt = load_frame(self.key, hashes[self.key], lambda: pd.read_csv(self.path), use_cache)
+        print(f"Framework catalog {self.path} {'loaded' if rebuilt else 'unchanged (cached)'}.")
+        if 'Control ID' not in df:
+            print(f"Warning: {self.path} has no 'Control ID' column; skipped")
+            return {"skeleton": None, "controls": empty_controls(), "targets": empty_targets()}
+        df = df[df['Control ID'].notna()]
+
+        def column(name, default=""):
+            if name not in df:
+                return pd.Series(default, index=df.index, dtype=object)
+            return df[name].where(df[name].notna(), default).map(str)
+
+        domain = column('Control Domain', "Uncategorized")
+        wave = pd.Series(assign_waves(df['Control ID'], domain), index=df.index)
+        if 'Wave' in df:
+            wave = pd.to_numeric(df['Wave'], errors='coerce').fillna(wave)
+
+        controls = pd.DataFrame({
+            'id': df['Control ID'].map(str).to_numpy(),
+            'text': column('Control Text').to_numpy(),
+            'help': column('Control Help').to_numpy(),
+            'domain': domain.to_numpy(),
+            'wave': wave.astype(int).to_numpy(),
+            'extra_key': domain.to_numpy(),
+            'framework': column('Framework', self.framework).to_numpy()
+        })
+        targets = explode_nist_targets(df, 'Control ID', 'NIST Mapping') if 'NIST Mapping' in df else empty_targets()
+        return {"skeleton": None, "controls": controls, "targets": targets}
+
+def get_default_sources(nist_csv, csa_excel):
+    """NIST skeleton, CSA AICM, then every frameworks/*.csv; earlier sources win on duplicate IDs."""
+    sources = [NistPlaybookSource(nist_csv), CsaAicmSource(csa_excel)]
+    for path in sorted(glob.glob(os.path.join(FRAMEWORK_DIR, "*.csv"))):
+        sources.append(ControlListSource(path))
+    return sources
+
+def run_source(source, hashes, use_cache):
+    """Worker entry point: parse one source and time it."""
+    start = time.perf_counter()
+    result = source.parse(hashes, use_cache)
+    result["elapsed"] = time.perf_counter() - start
+    return result
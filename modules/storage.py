@@ -1,13 +1,154 @@
 import sqlite3
+import json
 import pandas as pd
 from datetime import datetime
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from modules.responses import ResponseStore
 
 DB_FILE = "maturity.db"
 
+# --- Connection Pool ---
+# Connections are opened once and reused: idle ones wait in a per-database pool, and a
+# thread holds at most one at a time (nested calls share it). WAL lets dashboard reads
+# run alongside a save; writes take the lock up front (BEGIN IMMEDIATE) and wait up to
+# BUSY_TIMEOUT seconds for another writer instead of failing with "database is locked".
+
+POOL_SIZE = 8
+BUSY_TIMEOUT = 10.0 # Seconds
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"), # Durable in WAL mode except for the last commits on power loss
+    ("cache_size", -16000),    # KiB (16 MB page cache per connection)
+    ("mmap_size", 134217728),  # 128 MB memory-mapped reads
+    ("temp_store", "MEMORY")
+)
+
+_POOLS = {}            # db path -> LifoQueue of idle connections
+_POOL_LOCK = threading.Lock()
+_SCHEMA_READY = set()  # db paths whose schema was checked by this process
+_local = threading.local()
+
+# Response record columns written by save_assessment, in insert order
+RESPONSE_COLUMNS = ('assessment_id', 'category', 'question_id', 'score', 'notes', 'ai_justification', 'ai_sources', 'mapping')
+INSERT_RESPONSE_SQL = f"INSERT INTO responses ({', '.join(RESPONSE_COLUMNS)}) VALUES ({', '.join('?' * len(RESPONSE_COLUMNS))})"
+
+def _connect(path):
+    # Autocommit mode: transactions are explicit (see transaction())
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+def _pool(path):
+    with _POOL_LOCK:
+        return _POOLS.setdefault(path, queue.LifoQueue(maxsize=POOL_SIZE))
+
+@contextmanager
+def connection():
+    """Pooled connection to DB_FILE for the calling thread (reused by nested calls)."""
+    held = getattr(_local, 'conn', None)
+    if held is not None:
+        yield held
+        return
+
+    path = DB_FILE
+    if path not in _SCHEMA_READY:
+        init_db()
+    pool = _pool(path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _connect(path)
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        _local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+@contextmanager
+def transaction():
+    """Write transaction on the pooled connection; commits on success, rolls back on error."""
+    with connection() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+def close_connections():
+    """Close every idle pooled connection (e.g. before replacing the database file)."""
+    with _POOL_LOCK:
+        pools = list(_POOLS.values())
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+# --- Schema ---
+
+# Versioned migrations, applied in order on top of the base schema; the database's
+# PRAGMA user_version records the last one applied
+MIGRATIONS = (
+    (1, "covering indexes for history and detail lookups", (
+        "CREATE INDEX IF NOT EXISTS idx_responses_assessment ON responses (assessment_id, category, question_id)",
+        "CREATE INDEX IF NOT EXISTS idx_assessments_timestamp ON assessments (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_assessments_project ON assessments (project_name, scope, project_type)"
+    )),
+    (2, "per-assessment rollups", (
+        '''
+        CREATE TABLE IF NOT EXISTS assessment_rollups (
+            assessment_id INTEGER,
+            kind TEXT,
+            key TEXT,
+            mean_score REAL,
+            response_count INTEGER,
+            gap_count INTEGER,
+            implemented_count INTEGER,
+            compliance_pct REAL,
+            PRIMARY KEY (assessment_id, kind, key)
+        ) WITHOUT ROWID
+        ''',
+    )),
+    (3, "per-assessment score vectors", (
+        '''
+        CREATE TABLE IF NOT EXISTS assessment_vectors (
+            assessment_id INTEGER PRIMARY KEY,
+            scores BLOB,
+            ai_results TEXT
+        )
+        ''',
+    )),
+)
+
 def init_db():
-    """Initialize the SQLite database and handle schema updates."""
-    conn = sqlite3.connect(DB_FILE)
+    """Initialize the SQLite database and handle schema updates (once per process and database file)."""
+    path = DB_FILE
+    with _POOL_LOCK:
+        if path in _SCHEMA_READY:
+            return
+        _init_schema(path)
+        _SCHEMA_READY.add(path)
+
+def _init_schema(path):
+    conn = _connect(path)
+    conn.isolation_level = "" # Implicit transaction for the schema changes below
     c = conn.cursor()
     
     # Create Assessments table with new columns if creating from scratch
@@ -50,43 +191,98 @@ def init_db():
             question_id TEXT,
             score INTEGER,
             notes TEXT,
+            ai_justification TEXT,
+            ai_sources TEXT,
+            mapping TEXT,
             FOREIGN KEY (assessment_id) REFERENCES assessments (id)
         )
     ''')
+
+    c.execute("PRAGMA table_info(responses)")
+    columns = [info[1] for info in c.fetchall()]
+    for column in ('ai_justification', 'ai_sources', 'mapping'):
+        if column not in columns:
+            print(f"Migrating DB: Adding '{column}' column to responses")
+            try:
+                c.execute(f"ALTER TABLE responses ADD COLUMN {column} TEXT")
+            except Exception as e:
+                print(f"Migration error ({column}): {e}")
     
     conn.commit()
+    _apply_migrations(conn)
     conn.close()
 
-def save_assessment(project_name, responses, total_score, maturity_level, scope="org", project_type="none"):
-    """Save a full assessment and its responses."""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
+def _apply_migrations(conn):
+    conn.isolation_level = None # Explicit BEGIN/COMMIT per migration
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"Migrating DB to v{version}: {description}")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            print(f"Migration error (v{version}): {e}")
+            return
+
+def explain_query_plan(sql, params=()):
+    """SQLite's EXPLAIN QUERY PLAN detail lines for a query."""
+    with connection() as conn:
+        return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+def check_query_plans():
+    """(name, plan lines, uses expected index) for every QUERY_PLAN_CHECKS query."""
+    results = []
+    for name, (sql, params, index) in QUERY_PLAN_CHECKS.items():
+        plan = explain_query_plan(sql, params)
+        results.append((name, plan, any(index in line for line in plan)))
+    return results
+
+# --- Assessments ---
+
+def save_assessment(project_name, responses, total_score, maturity_level, scope="org", project_type="none", store=None):
+    """
+    Save a full assessment, its responses, its rollups and its score vectors in one transaction.
+    Responses are dicts with category, question_id, score and optionally notes,
+    ai_justification, ai_sources (list of source names or comma-joined text, stored as a JSON list), mapping (the NIST
+    subcategory) and domain (CSA domain, rollups only).
+    store: the session ResponseStore; its (scope, project_type) scores and AI results are saved
+    as the snapshot's vectors (without it they are built from the responses on first read).
+    """
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    c.execute('''
-        INSERT INTO assessments (timestamp, project_name, total_score, maturity_level, scope, project_type)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (
-        timestamp, 
-        project_name, 
-        total_score, 
-        maturity_level, 
-        scope, 
-        project_type
-    ))
-    
-    assessment_id = c.lastrowid
-    
-    for r in responses:
-        # Notes might contain relevant metadata, keeping as is
+    with transaction() as conn:
+        c = conn.cursor()
         c.execute('''
-            INSERT INTO responses (assessment_id, category, question_id, score, notes)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (assessment_id, r['category'], r['question_id'], r['score'], r.get('notes', '')))
+            INSERT INTO assessments (timestamp, project_name, total_score, maturity_level, scope, project_type)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            timestamp, 
+            project_name, 
+            total_score, 
+            maturity_level, 
+            scope, 
+            project_type
+        ))
+        
+        assessment_id = c.lastrowid
+        
+        # One prepared statement for every row; notes might contain relevant metadata, keeping as is
+        c.executemany(INSERT_RESPONSE_SQL, (
+            (assessment_id, r['category'], r['question_id'], r['score'], r.get('notes', ''),
+             r.get('ai_justification', ''), json.dumps(parse_ai_sources(r.get('ai_sources')), ensure_ascii=False),
+             r.get('mapping', ''))
+            for r in responses
+        ))
+        _write_rollups(conn, assessment_id, compute_rollups(responses))
+        if store is not None:
+            _write_vectors(conn, assessment_id, store, [(scope, project_type)])
         
-    conn.commit()
-    conn.close()
     return assessment_id
 
 def load_history():
@@ -94,50 +290,248 @@ def load_history():
     if not os.path.exists(DB_FILE):
         return pd.DataFrame()
         
-    conn = sqlite3.connect(DB_FILE)
-    try:
-        df = pd.read_sql_query("SELECT * FROM assessments ORDER BY timestamp DESC", conn)
-    except Exception as e:
-        print(f"Error loading history: {e}")
-        df = pd.DataFrame()
-    finally:
-        conn.close()
+    with connection() as conn:
+        try:
+            df = pd.read_sql_query("SELECT * FROM assessments ORDER BY timestamp DESC", conn)
+        except Exception as e:
+            print(f"Error loading history: {e}")
+            df = pd.DataFrame()
     return df
 
+# --- Rollups ---
+# Aggregates of each assessment's responses, written with it by save_assessment:
+# one 'total' row plus one row per category (NIST function) and per CSA domain.
+# Controls scoring IMPLEMENTED_SCORE or more count as implemented, the rest as gaps.
+
+IMPLEMENTED_SCORE = 3
+ROLLUP_KINDS = ('total', 'category', 'domain')
+ROLLUP_FIELDS = ('mean_score', 'response_count', 'gap_count', 'implemented_count', 'compliance_pct')
+
+def compute_rollups(responses, domain_of=None):
+    """
+    [(kind, key, mean_score, response_count, gap_count, implemented_count, compliance_pct)]
+    for response dicts (category, question_id, score and optionally domain).
+    domain_of(question_id) supplies the domain for rows that do not carry one.
+    """
+    sums = {}
+    for r in responses:
+        score = r['score'] or 0
+        domain = r.get('domain') or (domain_of(r['question_id']) if domain_of else None) or 'Unmapped'
+        for group in (('total', ''), ('category', r['category']), ('domain', domain)):
+            acc = sums.setdefault(group, [0.0, 0, 0])
+            acc[0] += score
+            acc[1] += 1
+            acc[2] += score >= IMPLEMENTED_SCORE
+    return [
+        (kind, key, total / count, count, count - implemented, implemented, implemented / count * 100)
+        for (kind, key), (total, count, implemented) in sums.items()
+    ]
+
+def _write_rollups(conn, assessment_id, rollups):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO assessment_rollups (assessment_id, kind, key, {', '.join(ROLLUP_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(assessment_id, *row) for row in rollups]
+    )
+
+def get_rollups(assessment_id, domain_of=None):
+    """
+    {'total': {field: value}, 'category': {key: {...}}, 'domain': {key: {...}}} for an assessment.
+    Snapshots saved before rollups existed are rolled up from their responses on first read
+    (domain_of as in compute_rollups). Returns None when the assessment has no responses.
+    """
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT kind, key, {', '.join(ROLLUP_FIELDS)} FROM assessment_rollups WHERE assessment_id = ?",
+            (assessment_id,)
+        ).fetchall()
+        if not rows:
+            responses = [
+                {'category': category, 'question_id': question_id, 'score': score}
+                for category, question_id, score in conn.execute(
+                    "SELECT category, question_id, score FROM responses WHERE assessment_id = ?", (assessment_id,))
+            ]
+            if not responses:
+                return None
+            rows = compute_rollups(responses, domain_of)
+            with transaction():
+                _write_rollups(conn, assessment_id, rows)
+
+    rollups = {kind: {} for kind in ROLLUP_KINDS}
+    for kind, key, *values in rows:
+        rollups[kind][key] = dict(zip(ROLLUP_FIELDS, values))
+    rollups['total'] = rollups['total'].get('', dict.fromkeys(ROLLUP_FIELDS, 0))
+    return rollups
+
+# --- Score Vectors ---
+# Each assessment's scores in ResponseStore.dumps form (zlib-compressed int8 arrays keyed
+# by catalog version) plus its AI results as JSON, written with the rollups, so a snapshot's
+# scores are read back without loading its response rows.
+
+def _write_vectors(conn, assessment_id, store, keys=None):
+    conn.execute(
+        "INSERT OR REPLACE INTO assessment_vectors (assessment_id, scores, ai_results) VALUES (?, ?, ?)",
+        (assessment_id, store.dumps(keys), store.dump_ai(keys))
+    )
+
+def get_snapshot_store(assessment_id, catalog, scope="org", project_type="none"):
+    """
+    ResponseStore holding a saved assessment's scores and AI results. Snapshots saved before
+    score vectors existed, or for another catalog version, are rebuilt from their responses
+    (as scope/project_type) on first read and written back. Returns None when the assessment
+    has no responses.
+    """
+    with connection() as conn:
+        row = conn.execute("SELECT scores, ai_results FROM assessment_vectors WHERE assessment_id = ?", (assessment_id,)).fetchone()
+        if row is not None:
+            try:
+                return ResponseStore.loads(row[0], catalog, row[1])
+            except ValueError:
+                pass
+        rows = conn.execute(
+            "SELECT question_id, score, ai_justification, ai_sources FROM responses WHERE assessment_id = ?", (assessment_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        store = ResponseStore(catalog)
+        for question_id, score, justification, sources in rows:
+            if score is not None:
+                store.set_score(scope, project_type, question_id, score)
+            if justification:
+                store.set_ai(scope, project_type, question_id, {'justification': justification, 'sources': parse_ai_sources(sources)})
+        with transaction():
+            _write_vectors(conn, assessment_id, store)
+    return store
+
+# --- History Pages ---
+# Newest first, ordered by (timestamp, id). Pages continue from the last row of the previous
+# page (keyset pagination), so reading a page costs the same however many snapshots are stored.
+
+HISTORY_PAGE_SIZE = 25
+
+def _history_filters(project=None, scope=None, project_type=None):
+    clauses, params = [], []
+    if project:
+        # Prefix range rather than LIKE so idx_assessments_project can serve it
+        clauses.append("project_name >= ? AND project_name < ?")
+        params += [project, project + "\U0010ffff"]
+    if scope:
+        clauses.append("scope = ?")
+        params.append(scope)
+    if project_type:
+        clauses.append("project_type = ?")
+        params.append(project_type)
+    return clauses, params
+
+def _history_page_query(limit=HISTORY_PAGE_SIZE, after=None, project=None, scope=None, project_type=None):
+    """(sql, params) of one load_history_page call."""
+    clauses, params = _history_filters(project, scope, project_type)
+    if after is not None:
+        clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+        params += [after[0], after[0], after[1]]
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"SELECT * FROM assessments {where} ORDER BY timestamp DESC, id DESC LIMIT ?", (*params, limit)
+
+def load_history_page(limit=HISTORY_PAGE_SIZE, after=None, project=None, scope=None, project_type=None):
+    """
+    (page, has_older): one page of past assessments, newest first, and whether more rows follow it.
+    One extra row is fetched to tell, so no count is needed to page through the history.
+    after: history_cursor() of the previous page; project: project name prefix.
+    """
+    if not os.path.exists(DB_FILE):
+        return pd.DataFrame(), False
+
+    sql, params = _history_page_query(limit + 1, after, project, scope, project_type)
+    with connection() as conn:
+        try:
+            df = pd.read_sql_query(sql, conn, params=params)
+        except Exception as e:
+            print(f"Error loading history page: {e}")
+            return pd.DataFrame(), False
+    return df.iloc[:limit], len(df) > limit
+
+def history_cursor(page):
+    """Cursor continuing after the last row of a page (None for an empty page)."""
+    if page.empty:
+        return None
+    last = page.iloc[-1]
+    return last['timestamp'], int(last['id'])
+
+def has_history():
+    """True if any assessment is saved (stops at the first row, unlike count_history)."""
+    if not os.path.exists(DB_FILE):
+        return False
+    with connection() as conn:
+        return bool(conn.execute("SELECT EXISTS(SELECT 1 FROM assessments LIMIT 1)").fetchone()[0])
+
+def count_history(project=None, scope=None, project_type=None):
+    """
+    Number of assessments matching the same filters as load_history_page. A full scan of the
+    matches, so the history view only runs it for an active search.
+    """
+    if not os.path.exists(DB_FILE):
+        return 0
+    clauses, params = _history_filters(project, scope, project_type)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM assessments {where}", params).fetchone()[0]
+
+# Hot queries and the index each must use (see check_query_plans); the history queries
+# are built by the same code as load_history_page
+QUERY_PLAN_CHECKS = {
+    'load_history': ("SELECT * FROM assessments ORDER BY timestamp DESC", (), "idx_assessments_timestamp"),
+    'get_assessment_details': ("SELECT * FROM responses WHERE assessment_id = ?", (1,), "idx_responses_assessment"),
+    'get_rollups': ("SELECT * FROM assessment_rollups WHERE assessment_id = ?", (1,), "PRIMARY KEY"),
+    'get_snapshot_store': ("SELECT scores, ai_results FROM assessment_vectors WHERE assessment_id = ?", (1,), "INTEGER PRIMARY KEY"),
+    'history_page': (*_history_page_query(after=("9999", 1)), "idx_assessments_timestamp"),
+    'history_search': (*_history_page_query(project="Project 1", scope="org"), "idx_assessments_project")
+}
+
 def get_assessment_details(assessment_id):
     """Get detailed responses for a specific assessment."""
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("SELECT * FROM responses WHERE assessment_id = ?", conn, params=(assessment_id,))
-    conn.close()
+    with connection() as conn:
+        df = pd.read_sql_query("SELECT * FROM responses WHERE assessment_id = ?", conn, params=(assessment_id,))
     return df
 
+def parse_ai_sources(value):
+    """
+    Source names of a responses.ai_sources value: a JSON list, or the comma-joined text older
+    rows hold. Lists (e.g. AI results) pass through, so the save path can normalize any form.
+    """
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(src) for src in value]
+    try:
+        sources = json.loads(value)
+    except ValueError:
+        return [src.strip() for src in value.split(',') if src.strip()]
+    return [str(src) for src in sources] if isinstance(sources, list) else [str(sources)]
+
 def delete_assessment(assessment_id):
     """Delete an assessment and its associated responses."""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
     try:
-        c.execute("DELETE FROM responses WHERE assessment_id = ?", (assessment_id,))
-        c.execute("DELETE FROM assessments WHERE id = ?", (assessment_id,))
-        conn.commit()
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM responses WHERE assessment_id = ?", (assessment_id,))
+            c.execute("DELETE FROM assessment_rollups WHERE assessment_id = ?", (assessment_id,))
+            c.execute("DELETE FROM assessment_vectors WHERE assessment_id = ?", (assessment_id,))
+            c.execute("DELETE FROM assessments WHERE id = ?", (assessment_id,))
         return True
     except Exception as e:
         print(f"Error deleting assessment: {e}")
         return False
-    finally:
-        conn.close()
 
 def delete_assessments_by_name(name_substring):
     """Delete all assessments whose project name contains the substring."""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
     try:
-        c.execute("SELECT id FROM assessments WHERE project_name LIKE ?", (f"%{name_substring}%",))
-        ids = [row[0] for row in c.fetchall()]
-        for aid in ids:
-            delete_assessment(aid)
+        # One transaction for the lookup and every delete
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id FROM assessments WHERE project_name LIKE ?", (f"%{name_substring}%",))
+            ids = [row[0] for row in c.fetchall()]
+            for aid in ids:
+                delete_assessment(aid)
         return len(ids)
     except Exception as e:
         print(f"Error deleting assessments by name: {e}")
         return 0
-    finally:
-        conn.close()
@@ -1,5 +1,6 @@
 import streamlit as st
 from typing import List
+from modules.responses import SCORE_OPTIONS
 
 
 def get_palo_alto_css():
@@ -519,8 +520,18 @@ def display_header(title, subtitle=""):
         </div>
     """, unsafe_allow_html=True)
 
-def render_control_input(control, unique_key, ai_feedback=None):
-    """Render a single CSA control input with Silicon Precision Glassmorphism and State Persistence."""
+def _store_widget_score(store, unique_key):
+    # on_change: the slider's new level goes straight into the response store
+    store[unique_key] = SCORE_OPTIONS.index(st.session_state[unique_key])
+
+def render_control_input(control, unique_key, ai_feedback=None, help_text=None, store=None):
+    """
+    Render a single CSA control input with Silicon Precision Glassmorphism and State Persistence.
+    help_text: the control's help (catalog views leave it out of the control record).
+    store: the session ResponseStore; user changes are written to it by the widget callback.
+    """
+    if help_text is None:
+        help_text = control.get('help', '')
     
     # --- Recovery Logic ---
     # If the widget key is missing from session_state (e.g. after a tab switch),
@@ -529,7 +540,7 @@ def render_control_input(control, unique_key, ai_feedback=None):
         saved_val = st.session_state.get('responses', {}).get(unique_key)
         if saved_val is not None:
             # Map index to string label for the select_slider
-            options = ["Not Implemented (0)", "Initial (1)", "Defined (2)", "Managed (3)", "Measured (4)", "Optimized (5)"]
+            options = SCORE_OPTIONS
             try:
                 # Ensure we store the label to match widget expectations
                 st.session_state[unique_key] = options[int(saved_val)]
@@ -580,7 +591,7 @@ def render_control_input(control, unique_key, ai_feedback=None):
         st.markdown(f"""
             <div style="margin: 1rem 0;">
                 <h3 style="margin: 0 0 0.5rem 0; line-height: 1.4;">{control['text']}</h3>
-                <p style="color: #64748B; font-size: 0.9rem; line-height: 1.6; margin: 0;">{control['help']}</p>
+                <p style="color: #64748B; font-size: 0.9rem; line-height: 1.6; margin: 0;">{help_text}</p>
             </div>
         """, unsafe_allow_html=True)
 
@@ -603,7 +614,7 @@ def render_control_input(control, unique_key, ai_feedback=None):
              """, unsafe_allow_html=True)
         
         # Maturity Selector (The Slider)
-        options = ["Not Implemented (0)", "Initial (1)", "Defined (2)", "Managed (3)", "Measured (4)", "Optimized (5)"]
+        options = SCORE_OPTIONS
         
         # Close the Glass Card div before rendering Streamlit widgets (safety first)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -613,7 +624,9 @@ def render_control_input(control, unique_key, ai_feedback=None):
             options=options,
             value=options[current_idx],
             key=unique_key,
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            on_change=_store_widget_score if store is not None else None,
+            args=(store, unique_key) if store is not None else None
         )
         
         return options.index(selected_label)
@@ -0,0 +1,101 @@
+import sys
+import os
+import random
+
+# Ensure we can import from modules
+sys.path.append(os.getcwd())
+
+from modules import data, adapter, scoring, responses, indicators
+
+# Checks of the scoring layer on the real catalog:
+#   roadmap      - every gap subcategory is placed in some bucket when max_items allows it
+#   sensitivity  - the Quick Win ranking follows the answers it is given
+#   answers      - every maturity level has its own answer; progress and scoring agree on answered
+#   indicators   - an empty store gives 0% indicators, a filled one does not
+#   python verify_scoring.py
+
+def random_answers(control_ids, seed):
+    rng = random.Random(seed)
+    return {c_id: {'response': rng.choice(['Sim', 'Parcial', 'Não', 'NA']), 'evidence_ok': rng.choice(['Sim', 'Parcial', 'Não'])}
+            for c_id in control_ids if rng.random() < 0.5}
+
+def check_roadmap(catalog, scope, project_type, answers, label):
+    print(f"\n--- Roadmap: {label} ({scope}/{project_type}) ---")
+    metrics = adapter.get_v2_metrics(answers, scope, project_type, catalog=catalog)
+    gaps = {sm.subcat_id for dm in metrics for sm in dm.subcategory_metrics
+            if sm.critical_gaps > 0 or sm.score < 0.5}
+    roadmap = scoring.generate_roadmap(metrics, max_items=len(gaps))
+    placed = [item.subcat_id for item in roadmap]
+    largest = max(budget for _, _, budget in scoring.ROADMAP_BUCKETS if budget is not None)
+    oversized = [sm.subcat_id for dm in metrics for sm in dm.subcategory_metrics
+                 if sm.subcat_id in gaps and scoring.roadmap_gain_effort(sm)[1] > largest]
+    print(f"Gap subcategories: {len(gaps)} ({len(oversized)} above the largest budget) | Placed: {len(placed)}")
+    missing = gaps - set(placed)
+    if missing or len(placed) != len(set(placed)):
+        print(f"[FAIL] Not placed: {sorted(missing)[:10]} | duplicates: {len(placed) - len(set(placed))}")
+        return False
+    print("[OK] Every gap subcategory is placed once")
+    return True
+
+def top_gains(catalog, scores, scope, project_type, k=3):
+    answers = {q_id: responses.score_answer(score) for q_id, score in scores.items()}
+    return [g['question_id'] for g in adapter.get_sensitivity(answers, scope, project_type, catalog=catalog, top_k=k)]
+
+def check_sensitivity(catalog, scope, project_type):
+    print(f"\n--- Sensitivity ({scope}/{project_type}) ---")
+    ids = catalog.control_ids
+    rng = random.Random(3)
+    empty = top_gains(catalog, {}, scope, project_type)
+    raised = top_gains(catalog, {empty[0]: 5}, scope, project_type) if empty else []
+    mixed = top_gains(catalog, {c_id: rng.randint(0, 5) for c_id in ids}, scope, project_type)
+    full = top_gains(catalog, {c_id: 5 for c_id in ids}, scope, project_type)
+    print(f"Unanswered: {empty} | top control at 5: {raised} | random: {mixed} | all at 5: {full}")
+    ok = bool(empty) and empty[0] not in raised and mixed != empty and not full
+    print("[OK] Ranking changes with the answers" if ok else "[FAIL] Ranking does not follow the answers")
+    return ok
+
+def check_answers(catalog, scope, project_type):
+    print(f"\n--- Score answers ({scope}/{project_type}) ---")
+    levels = range(len(responses.SCORE_OPTIONS))
+    rated = [scoring.RESPONSE_SCORES[r] * scoring.EVIDENCE_MULTIPLIERS[ev] for r, ev in responses.SCORE_ANSWERS]
+    round_trip = all(responses.answer_score(responses.score_answer(s)) == s for s in levels)
+    increasing = all(a < b for a, b in zip(rated, rated[1:]))
+    # Progress and the scoring answers_map must agree on what is answered (0 included)
+    store = responses.ResponseStore(catalog)
+    for i, c_id in enumerate(catalog.control_ids[::3]):
+        store.set_score(scope, project_type, c_id, i % 2)
+    completed, total = data.get_progress(store, scope, project_type, catalog=catalog)
+    answered_ids = store.answers_map(scope, project_type)
+    rows = catalog.select_rows(scope, project_type)
+    expected = sum(1 for pos in catalog.table['control_idx'].to_numpy()[rows] if catalog.control_ids[pos] in answered_ids)
+    print(f"Levels rated {[round(r, 3) for r in rated]} | round trip: {round_trip} | progress {completed}/{total}, answers_map rows {expected}")
+    ok = round_trip and increasing and completed == expected > 0
+    print("[OK] Levels are distinct and answered is shared" if ok else "[FAIL] Levels collide or answered differs")
+    return ok
+
+def check_indicators(catalog, scope, project_type):
+    print(f"\n--- Indicators ({scope}/{project_type}) ---")
+    store = responses.ResponseStore(catalog)
+    control_idx = adapter.build_selection(catalog, scope, project_type)['control_idx']
+    empty = indicators.calculate_indicators(store.scores(scope, project_type), catalog=catalog, control_idx=control_idx)
+    for c_id in catalog.control_ids:
+        store.set_score(scope, project_type, c_id, 3)
+    filled = indicators.calculate_indicators(store.scores(scope, project_type), catalog=catalog, control_idx=control_idx)
+    print("Empty: " + ", ".join(f"{i['id']}={i['percentage']:.0f}%" for i in empty))
+    print("All at 3: " + ", ".join(f"{i['id']}={i['percentage']:.0f}% ({i['value']}/{i['total']})" for i in filled))
+    ok = bool(filled) and all(i['percentage'] == 0 for i in empty) and all(i['value'] > 0 and i['percentage'] > 0 for i in filled)
+    print("[OK] Indicators follow the store" if ok else "[FAIL] Indicators ignore the store")
+    return ok
+
+if __name__ == "__main__":
+    catalog = data.get_catalog()
+    results = [
+        check_roadmap(catalog, "org", "none", {}, "unanswered"),
+        check_roadmap(catalog, "org", "none", random_answers(catalog.control_ids, 1), "random answers"),
+        check_roadmap(catalog, "project", "saas", random_answers(catalog.control_ids, 2), "random answers"),
+        check_sensitivity(catalog, "org", "none"),
+        check_sensitivity(catalog, "project", "cloud"),
+        check_answers(catalog, "org", "none"),
+        check_indicators(catalog, "org", "none")
+    ]
+    sys.exit(0 if all(results) else 1)
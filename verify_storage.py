@@ -0,0 +1,86 @@
+import sys
+import os
+import time
+import random
+import tempfile
+
+# Ensure we can import from modules
+sys.path.append(os.getcwd())
+
+from modules import storage, data, responses
+
+# Checks that the hot history/detail queries use their indexes (EXPLAIN QUERY PLAN)
+# and that snapshot score vectors round-trip, on a scratch database seeded with
+# synthetic snapshots; maturity.db is not touched.
+#   python verify_storage.py [snapshots] [responses per snapshot]
+
+def seed(n_snapshots, n_responses):
+    rng = random.Random(0)
+    rows = [{'category': rng.choice(["GOVERN", "MAP", "MEASURE", "MANAGE"]), 'question_id': f"Q-{i:04d}",
+             'score': rng.randint(0, 5), 'mapping': "GOVERN 1.1"} for i in range(n_responses)]
+    with storage.transaction():
+        for i in range(n_snapshots):
+            storage.save_assessment(f"Project {i % 500}", rows, rng.random() * 5, "Initial",
+                                    scope=rng.choice(["org", "project"]), project_type=rng.choice(["none", "cloud", "saas"]))
+
+def check_vectors(catalog):
+    print("\n--- Score vectors ---")
+    rng = random.Random(1)
+    store = responses.ResponseStore(catalog)
+    for c_id in catalog.control_ids:
+        if rng.random() < 0.5:
+            store.set_score("project", "saas", c_id, rng.randint(0, 5))
+    store.set_score("org", "none", catalog.control_ids[0], 5) # Other scopes are not saved
+    store.set_ai("project", "saas", catalog.control_ids[1], {'justification': "Policy found", 'sources': ["a.pdf", "b, c.pdf"]})
+    rows = [{'category': "GOVERN", 'question_id': c_id, 'score': store.get_score("project", "saas", c_id),
+             'ai_justification': (store.get_ai("project", "saas", c_id) or {}).get('justification', ''),
+             'ai_sources': (store.get_ai("project", "saas", c_id) or {}).get('sources')} for c_id in catalog.control_ids]
+    saved = storage.save_assessment("Vectors", rows, 0, "Initial", scope="project", project_type="saas", store=store)
+    legacy = storage.save_assessment("Vectors (legacy)", rows, 0, "Initial", scope="project", project_type="saas")
+
+    loaded = storage.get_snapshot_store(saved, catalog, "project", "saas")
+    rebuilt = storage.get_snapshot_store(legacy, catalog, "project", "saas")
+    with storage.connection() as conn:
+        blob = conn.execute("SELECT scores FROM assessment_vectors WHERE assessment_id = ?", (saved,)).fetchone()[0]
+        backfilled = conn.execute("SELECT COUNT(*) FROM assessment_vectors WHERE assessment_id = ?", (legacy,)).fetchone()[0]
+    print(f"{len(catalog.control_ids)} controls -> {len(blob)} byte blob | legacy snapshot backfilled: {bool(backfilled)}")
+    same = (loaded.answers_map("project", "saas") == store.answers_map("project", "saas")
+            and loaded.get_ai("project", "saas", catalog.control_ids[1]) == store.get_ai("project", "saas", catalog.control_ids[1])
+            and not loaded.answers_map("org", "none"))
+    # Legacy rows hold 0 for unanswered controls, so only the answered scores must match
+    legacy_ok = all(rebuilt.get_score("project", "saas", c_id) == score for c_id, score in
+                    ((c, store.get_score("project", "saas", c)) for c in catalog.control_ids))
+    ok = same and legacy_ok and bool(backfilled)
+    print("[OK] Vectors round-trip" if ok else "[FAIL] Vectors differ from the saved store")
+    return ok
+
+def time_query(label, fn):
+    start = time.perf_counter()
+    fn()
+    print(f"{label:<28} {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    n_snapshots = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n_responses = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    storage.DB_FILE = os.path.join(tempfile.mkdtemp(), "verify_storage.db")
+    storage.init_db()
+    print(f"Seeding {n_snapshots} snapshots x {n_responses} responses into {storage.DB_FILE}...")
+    seed(n_snapshots, n_responses)
+    with storage.connection() as conn:
+        conn.execute("ANALYZE")
+
+    failed = False
+    for name, plan, ok in storage.check_query_plans():
+        print(f"\n--- {name} ---")
+        for line in plan:
+            print(f"  {line}")
+        print("[OK] Uses its index" if ok else "[FAIL] Index not used")
+        failed = failed or not ok
+
+    failed = not check_vectors(data.get_catalog()) or failed
+
+    print()
+    time_query("load_history", storage.load_history)
+    time_query("get_assessment_details", lambda: storage.get_assessment_details(n_snapshots // 2))
+    sys.exit(1 if failed else 0)